@@ -1,146 +1,3 @@
-# backend/main.py
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from contextlib import asynccontextmanager
-import os
-import logging
-from pathlib import Path
-
-from backend.database import engine, SessionLocal
-from backend.models import Base
-from backend.config import settings
-from backend.api import generation, gallery, projects, settings as settings_api, dashboard
-from backend.providers import initialize_providers
-from backend.utils.file_manager import FileManager
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Manage application lifecycle"""
-    # Startup
-    logger.info("Starting AI Image Generator...")
-    
-    # Create database tables
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database initialized")
-    
-    # Initialize storage directories
-    file_manager = FileManager()
-    file_manager.setup_directories()
-    logger.info("Storage directories initialized")
-    
-    # Initialize providers
-    initialize_providers()
-    logger.info("Providers initialized")
-    
-    yield
-    
-    # Shutdown
-    logger.info("Shutting down AI Image Generator...")
-
-
-# Create FastAPI app
-app = FastAPI(
-    title="AI Image Generator API",
-    description="Generate images using multiple AI providers",
-    version="1.0.0",
-    lifespan=lifespan
-)
-
-# Configure CORS for development
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:8000", "http://127.0.0.1:8000"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Mount static files
-static_path = Path(__file__).parent.parent / "frontend"
-if static_path.exists():
-    app.mount("/static", StaticFiles(directory=str(static_path)), name="static")
-
-# Mount storage for serving generated images
-storage_path = Path(__file__).parent.parent / "storage"
-if storage_path.exists():
-    app.mount("/storage", StaticFiles(directory=str(storage_path)), name="storage")
-
-# Include API routers
-app.include_router(generation.router, prefix="/api/generation", tags=["Generation"])
-app.include_router(gallery.router, prefix="/api/gallery", tags=["Gallery"])
-app.include_router(projects.router, prefix="/api/projects", tags=["Projects"])
-app.include_router(settings_api.router, prefix="/api/settings", tags=["Settings"])
-app.include_router(dashboard.router, prefix="/api/dashboard", tags=["Dashboard"])
-
-
-@app.get("/")
-async def root():
-    """Serve the frontend application"""
-    html_file = static_path / "index.html"
-    if html_file.exists():
-        return FileResponse(html_file)
-    return {"message": "AI Image Generator API"}
-
-
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    return {
-        "status": "healthy",
-        "version": "1.0.0"
-    }
-
-
-@app.get("/api/providers")
-async def get_providers():
-    """Get list of available providers and their models"""
-    db = SessionLocal()
-    try:
-        from backend.models import Provider, Model
-        providers = db.query(Provider).filter(Provider.is_active == True).all()
-        
-        result = []
-        for provider in providers:
-            models = db.query(Model).filter(
-                Model.provider_id == provider.id,
-                Model.is_active == True
-            ).all()
-            
-            result.append({
-                "id": provider.id,
-                "name": provider.name,
-                "type": provider.type.value,
-                "models": [
-                    {
-                        "id": model.id,
-                        "name": model.name,
-                        "display_name": model.display_name or model.name,
-                        "model_id": model.model_id,
-                        "type": model.type.value,
-                        "max_width": model.max_width,
-                        "max_height": model.max_height,
-                        "supports_img2img": model.supports_img2img,
-                        "supports_inpainting": model.supports_inpainting
-                    }
-                    for model in models
-                ]
-            })
-        
-        return result
-    finally:
-        db.close()
-
-
 # backend/database.py
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
@@ -221,7 +78,7 @@ settings = Settings()
 
 
 # backend/security.py
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 from passlib.context import CryptContext
 import os
 import base64
@@ -247,18 +104,22 @@ def get_or_create_key():
 
 class APIKeyEncryption:
     def __init__(self):
-        self.cipher = Fernet(get_or_create_key())
+        # MultiFernet lets old keys be appended later for rotation
+        self.cipher = MultiFernet([Fernet(get_or_create_key())])
     
     def encrypt(self, api_key: str) -> str:
         """Encrypt an API key"""
-        encrypted = self.cipher.encrypt(api_key.encode())
-        return base64.b64encode(encrypted).decode()
+        # Fernet tokens are already URL-safe base64
+        return self.cipher.encrypt(api_key.encode()).decode()
     
     def decrypt(self, encrypted_key: str) -> str:
         """Decrypt an API key"""
-        encrypted = base64.b64decode(encrypted_key.encode())
-        decrypted = self.cipher.decrypt(encrypted)
-        return decrypted.decode()
+        try:
+            return self.cipher.decrypt(encrypted_key.encode()).decode()
+        except InvalidToken:
+            # Keys stored before the format change carry an extra base64 layer
+            encrypted = base64.b64decode(encrypted_key.encode())
+            return self.cipher.decrypt(encrypted).decode()
 
 
 # Singleton instance
@@ -267,54 +128,94 @@ encryption = APIKeyEncryption()
 
 # backend/utils/file_manager.py
 import os
+import mmap
+import asyncio
 import hashlib
 import shutil
+from functools import cached_property
 from pathlib import Path
 from typing import Optional, Tuple
+import aiofiles
 from PIL import Image
 from datetime import datetime
 from backend.config import settings
+from backend.concurrency import THUMBNAIL_SEMAPHORE
 
 
 class FileManager:
     def __init__(self):
         self.storage_path = settings.STORAGE_PATH
-        self.images_dir = self.storage_path / settings.IMAGES_DIR
-        self.thumbnails_dir = self.storage_path / settings.THUMBNAILS_DIR
-        self.temp_dir = self.storage_path / settings.TEMP_DIR
+        # Plain-string copies so hot paths can join without Path.__fspath__
+        self._images_str = str(self.images_dir)
+        self._thumbnails_str = str(self.thumbnails_dir)
+    
+    @cached_property
+    def images_dir(self) -> Path:
+        return self.storage_path / settings.IMAGES_DIR
+    
+    @cached_property
+    def thumbnails_dir(self) -> Path:
+        return self.storage_path / settings.THUMBNAILS_DIR
+    
+    @cached_property
+    def temp_dir(self) -> Path:
+        return self.storage_path / settings.TEMP_DIR
     
     def setup_directories(self):
         """Create necessary storage directories"""
         for directory in [self.images_dir, self.thumbnails_dir, self.temp_dir]:
             directory.mkdir(parents=True, exist_ok=True)
     
+    def _make_filename(self, image_data: bytes) -> str:
+        """Generate a timestamped filename for an image"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_hash = hashlib.blake2b(image_data, digest_size=4).hexdigest()
+        return f"img_{timestamp}_{file_hash}.png"
+    
     def save_image(self, image_data: bytes, filename: str = None) -> Tuple[str, str]:
         """Save image and create thumbnail"""
         # Generate filename if not provided
         if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            file_hash = hashlib.md5(image_data).hexdigest()[:8]
-            filename = f"img_{timestamp}_{file_hash}.png"
+            filename = self._make_filename(image_data)
         
         # Save full image
-        image_path = self.images_dir / filename
+        image_path = os.path.join(self._images_str, filename)
         with open(image_path, "wb") as f:
             f.write(image_data)
         
         # Create thumbnail
         thumbnail_path = self.create_thumbnail(image_path, filename)
         
-        return str(image_path), str(thumbnail_path)
+        return image_path, thumbnail_path
+    
+    async def asave_image(self, image_data: bytes, filename: str = None) -> Tuple[str, str]:
+        """Save image without blocking the event loop and thumbnail it in a worker thread"""
+        if not filename:
+            filename = self._make_filename(image_data)
+        
+        image_path = os.path.join(self._images_str, filename)
+        async with aiofiles.open(image_path, "wb") as f:
+            await f.write(image_data)
+        
+        # Pillow work is CPU-bound, so it still needs a thread
+        async with THUMBNAIL_SEMAPHORE:
+            thumbnail_path = await asyncio.to_thread(self.create_thumbnail, image_path, filename)
+        
+        return image_path, thumbnail_path
     
-    def create_thumbnail(self, image_path: Path, filename: str) -> str:
+    def create_thumbnail(self, image_path: str, filename: str) -> str:
         """Create thumbnail for an image"""
-        thumbnail_path = self.thumbnails_dir / f"thumb_{filename}"
+        thumbnail_path = os.path.join(self._thumbnails_str, f"thumb_{filename}")
         
         with Image.open(image_path) as img:
+            # Let the JPEG decoder downscale via reduced-size IDCT before resampling
+            if img.format == "JPEG":
+                img.draft("RGB", (settings.THUMBNAIL_SIZE[0] * 2, settings.THUMBNAIL_SIZE[1] * 2))
             img.thumbnail(settings.THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
-            img.save(thumbnail_path, "PNG")
+            # Thumbnails are tiny, so favour encode speed over compression
+            img.save(thumbnail_path, "PNG", optimize=False, compress_level=1)
         
-        return str(thumbnail_path)
+        return thumbnail_path
     
     def delete_image(self, image_path: str, thumbnail_path: str = None):
         """Delete image and its thumbnail"""
@@ -326,25 +227,35 @@ class FileManager:
     
     def get_file_hash(self, file_path: str) -> str:
         """Calculate SHA256 hash of a file"""
-        sha256_hash = hashlib.sha256()
         with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+            if hasattr(hashlib, "file_digest"):  # Python 3.11+
+                return hashlib.file_digest(f, "sha256").hexdigest()
+            
+            # Older Pythons: hash the whole file in one call over a memory map
+            if os.fstat(f.fileno()).st_size == 0:
+                return hashlib.sha256().hexdigest()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return hashlib.sha256(mm).hexdigest()
     
     def get_storage_info(self) -> dict:
         """Get storage usage information"""
         total_size = 0
         image_count = 0
         
-        for file_path in self.images_dir.glob("*"):
-            if file_path.is_file():
-                total_size += file_path.stat().st_size
-                image_count += 1
+        # DirEntry caches stat data from readdir, avoiding a stat per file
+        with os.scandir(self.images_dir) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False):
+                    total_size += entry.stat(follow_symlinks=False).st_size
+                    image_count += 1
         
         return {
             "total_size": total_size,
             "total_size_mb": round(total_size / (1024 * 1024), 2),
             "image_count": image_count,
             "storage_path": str(self.storage_path)
-        }
\ No newline at end of file
+        }
+
+
+# Shared instance; import this rather than constructing FileManager per request
+file_manager = FileManager()
\ No newline at end of file
@@ -3,7 +3,9 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
 from typing import List, Optional
 from pydantic import BaseModel, Field
-import json
+import os
+import asyncio
+from functools import lru_cache
 from ..providers.fal_ai_extended import (
     FalAIProvider,
     process_wan25_request,
@@ -11,6 +13,9 @@ from ..providers.fal_ai_extended import (
     process_product_shoot_request
 )
 from ..database import get_db
+from ..concurrency import get_generation_semaphore
+from ..utils.image_utils import spool_upload, spool_uploads, remove_temp_files
+from ..utils.image_pre import shrink_to_data_url
 from ..models import Generation, Project
 from sqlalchemy.orm import Session
 import uuid
@@ -58,10 +63,28 @@ class ProductShootRequest(BaseModel):
     generate_variations: bool = True
     project_id: Optional[int] = None
 
+# Shots generated per provider call; larger batches are split into concurrent calls
+PRODUCT_SHOTS_PER_REQUEST = 2
+
+def _split_batch(batch_size: int) -> List[int]:
+    """Split batch_size into near-equal per-call sizes that sum back to batch_size"""
+    calls = -(-batch_size // PRODUCT_SHOTS_PER_REQUEST)
+    base, extra = divmod(batch_size, calls)
+    return [base + (i < extra) for i in range(calls)]
+
+def _merge_shoot_results(results: List[dict]) -> dict:
+    """Concatenate images from split calls, keeping each call's other fields under 'calls'"""
+    if len(results) == 1:
+        return results[0]
+    return {
+        "images": [img for r in results for img in r.get("images", [])],
+        "calls": [{k: v for k, v in r.items() if k != "images"} for r in results]
+    }
+
 # Get provider instance (you'd normally inject this via dependency)
+@lru_cache(maxsize=1)
 def get_fal_provider():
     # Load from config/env
-    import os
     api_key = os.getenv("FAL_API_KEY")
     if not api_key:
         raise HTTPException(status_code=500, detail="Fal.ai API key not configured")
@@ -73,19 +96,29 @@ async def generate_wan25(
     reference_images: Optional[List[UploadFile]] = File(None),
     settings: str = Form(...),  # JSON string of WAN25Request
     db: Session = Depends(get_db),
-    provider: FalAIProvider = Depends(get_fal_provider)
+    provider: FalAIProvider = Depends(get_fal_provider),
+    semaphore: asyncio.Semaphore = Depends(get_generation_semaphore)
 ):
     """Generate image using WAN-25 Preview model with multiple reference images"""
     
+    temp_paths = []
     try:
         # Parse settings
-        request_data = WAN25Request(**json.loads(settings))
+        request_data = WAN25Request.model_validate_json(settings)
         
-        # Read images
-        main_img_data = await main_image.read()
-        ref_imgs_data = None
+        # Spool images to disk instead of buffering them in memory
+        main_img_path = await spool_upload(main_image)
+        temp_paths.append(main_img_path)
+        ref_img_paths = None
         if reference_images:
-            ref_imgs_data = [await img.read() for img in reference_images]
+            ref_img_paths = await spool_uploads(reference_images)
+            temp_paths.extend(ref_img_paths)
+        
+        # Downscale uploads before they are base64-encoded for the provider
+        main_img_data = await shrink_to_data_url(main_img_path)
+        ref_imgs_data = None
+        if ref_img_paths:
+            ref_imgs_data = list(await asyncio.gather(*(shrink_to_data_url(p) for p in ref_img_paths)))
         
         # Create generation record
         generation = Generation(
@@ -101,20 +134,21 @@ async def generate_wan25(
         db.commit()
         
         # Process request
-        result = await process_wan25_request(
-            provider=provider,
-            prompt=request_data.prompt,
-            main_image=main_img_data,
-            reference_images=ref_imgs_data,
-            image_influence=request_data.image_influence,
-            style_strength=request_data.style_strength,
-            aspect_ratio=request_data.aspect_ratio,
-            output_size=request_data.output_size,
-            guidance_scale=request_data.guidance_scale,
-            seed=request_data.seed,
-            hd_output=request_data.hd_output,
-            auto_enhance=request_data.auto_enhance
-        )
+        async with semaphore:
+            result = await process_wan25_request(
+                provider=provider,
+                prompt=request_data.prompt,
+                main_image=main_img_data,
+                reference_images=ref_imgs_data,
+                image_influence=request_data.image_influence,
+                style_strength=request_data.style_strength,
+                aspect_ratio=request_data.aspect_ratio,
+                output_size=request_data.output_size,
+                guidance_scale=request_data.guidance_scale,
+                seed=request_data.seed,
+                hd_output=request_data.hd_output,
+                auto_enhance=request_data.auto_enhance
+            )
         
         # Update generation record
         generation.status = "completed"
@@ -134,6 +168,8 @@ async def generate_wan25(
             generation.error = str(e)
             db.commit()
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        remove_temp_files(temp_paths)
 
 @router.post("/qwen-edit")
 async def edit_with_qwen(
@@ -141,18 +177,24 @@ async def edit_with_qwen(
     mask: Optional[UploadFile] = File(None),
     settings: str = Form(...),  # JSON string of QwenEditRequest
     db: Session = Depends(get_db),
-    provider: FalAIProvider = Depends(get_fal_provider)
+    provider: FalAIProvider = Depends(get_fal_provider),
+    semaphore: asyncio.Semaphore = Depends(get_generation_semaphore)
 ):
     """Edit image using Qwen Image Edit Plus model"""
     
+    temp_paths = []
     try:
         # Parse settings
-        request_data = QwenEditRequest(**json.loads(settings))
+        request_data = QwenEditRequest.model_validate_json(settings)
         
-        # Read images
-        img_data = await image.read()
+        # Spool the image to disk; the mask is small enough to keep in memory
+        img_path = await spool_upload(image)
+        temp_paths.append(img_path)
         mask_data = await mask.read() if mask else None
         
+        # Downscale the image before upload unless a mask must stay pixel-aligned with it
+        img_data = img_path if mask_data else await shrink_to_data_url(img_path)
+        
         # Create generation record
         generation = Generation(
             id=str(uuid.uuid4()),
@@ -167,17 +209,18 @@ async def edit_with_qwen(
         db.commit()
         
         # Process request
-        result = await process_qwen_edit_request(
-            provider=provider,
-            image=img_data,
-            instruction=request_data.instruction,
-            mask=mask_data,
-            edit_type=request_data.edit_type,
-            edit_strength=request_data.edit_strength,
-            coherence=request_data.coherence,
-            auto_mask=request_data.auto_mask,
-            preserve_style=request_data.preserve_style
-        )
+        async with semaphore:
+            result = await process_qwen_edit_request(
+                provider=provider,
+                image=img_data,
+                instruction=request_data.instruction,
+                mask=mask_data,
+                edit_type=request_data.edit_type,
+                edit_strength=request_data.edit_strength,
+                coherence=request_data.coherence,
+                auto_mask=request_data.auto_mask,
+                preserve_style=request_data.preserve_style
+            )
         
         # Update generation record
         generation.status = "completed"
@@ -197,22 +240,30 @@ async def edit_with_qwen(
             generation.error = str(e)
             db.commit()
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        remove_temp_files(temp_paths)
 
 @router.post("/product-photoshoot")
 async def generate_product_shots(
     product_images: List[UploadFile] = File(...),
     settings: str = Form(...),  # JSON string of ProductShootRequest
     db: Session = Depends(get_db),
-    provider: FalAIProvider = Depends(get_fal_provider)
+    provider: FalAIProvider = Depends(get_fal_provider),
+    semaphore: asyncio.Semaphore = Depends(get_generation_semaphore)
 ):
     """Generate product photography using Product Photoshoot model"""
     
+    temp_paths = []
     try:
         # Parse settings
-        request_data = ProductShootRequest(**json.loads(settings))
+        request_data = ProductShootRequest.model_validate_json(settings)
+        
+        # Spool images to disk instead of buffering them in memory
+        img_paths = await spool_uploads(product_images)
+        temp_paths.extend(img_paths)
         
-        # Read images
-        imgs_data = [await img.read() for img in product_images]
+        # Downscale uploads before they are base64-encoded for the provider
+        imgs_data = list(await asyncio.gather(*(shrink_to_data_url(p) for p in img_paths)))
         
         # Create generation record
         generation = Generation(
@@ -227,26 +278,32 @@ async def generate_product_shots(
         db.add(generation)
         db.commit()
         
-        # Process request
-        result = await process_product_shoot_request(
-            provider=provider,
-            product_images=imgs_data,
-            category=request_data.product_category,
-            description=request_data.product_description,
-            scene_type=request_data.scene_type,
-            background_style=request_data.background_style,
-            lighting_setup=request_data.lighting_setup,
-            props=request_data.props,
-            remove_background=request_data.remove_background,
-            preserve_shadows=request_data.preserve_shadows,
-            color_palette=request_data.color_palette,
-            reflection_intensity=request_data.reflection_intensity,
-            output_format=request_data.output_format,
-            resolution=request_data.resolution,
-            batch_size=request_data.batch_size,
-            add_watermark=request_data.add_watermark,
-            generate_variations=request_data.generate_variations
-        )
+        # Split the batch into concurrent calls that each see every product view,
+        # each one holding its own generation slot
+        async def shoot(shots):
+            async with semaphore:
+                return await process_product_shoot_request(
+                    provider=provider,
+                    product_images=imgs_data,
+                    category=request_data.product_category,
+                    description=request_data.product_description,
+                    scene_type=request_data.scene_type,
+                    background_style=request_data.background_style,
+                    lighting_setup=request_data.lighting_setup,
+                    props=request_data.props,
+                    remove_background=request_data.remove_background,
+                    preserve_shadows=request_data.preserve_shadows,
+                    color_palette=request_data.color_palette,
+                    reflection_intensity=request_data.reflection_intensity,
+                    output_format=request_data.output_format,
+                    resolution=request_data.resolution,
+                    batch_size=shots,
+                    add_watermark=request_data.add_watermark,
+                    generate_variations=request_data.generate_variations
+                )
+        
+        results = await asyncio.gather(*(shoot(shots) for shots in _split_batch(request_data.batch_size)))
+        result = _merge_shoot_results(results)
         
         # Update generation record
         generation.status = "completed"
@@ -267,6 +324,8 @@ async def generate_product_shots(
             generation.error = str(e)
             db.commit()
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        remove_temp_files(temp_paths)
 
 @router.get("/models")
 async def get_available_models():
@@ -1,9 +1,36 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from typing import List, Optional
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from backend.dependencies import get_gallery_manager
+from backend.gallery_manager import GalleryManager
+
 router = APIRouter()
 
+class SaveImageRequest(BaseModel):
+    image_url: str
+    prompt: str
+    model: str
+    params: dict = {}
+
+@router.post("/gallery/save")
+async def save_to_gallery(
+    request: SaveImageRequest,
+    background_tasks: BackgroundTasks,
+    gallery_manager: GalleryManager = Depends(get_gallery_manager)
+):
+    """Save a generated image; the thumbnail is built after the response is sent"""
+    image_info = await gallery_manager.save_image(
+        image_url=request.image_url,
+        prompt=request.prompt,
+        model=request.model,
+        params=request.params,
+        create_thumbnail=False
+    )
+    background_tasks.add_task(gallery_manager.create_thumbnail, image_info["filename"])
+    return image_info
+
 @router.get("/gallery")
 async def get_gallery(skip: int = 0, limit: int = 20):
     """Get gallery images"""
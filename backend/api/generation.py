@@ -3,6 +3,12 @@ from typing import Optional
 import uuid
 import json
 
+import asyncio
+
+from backend.concurrency import get_generation_semaphore
+from backend.dependencies import get_fal_provider
+from backend.providers.fal_ai import FalAIProvider
+
 router = APIRouter()
 
 @router.post("/generate")
@@ -15,32 +21,26 @@ async def generate_image(
     steps: int = Form(4),
     cfg_scale: float = Form(7.5),
     seed: Optional[int] = Form(None),
-    provider: str = Form("fal_ai")
+    provider: str = Form("fal_ai"),
+    provider_instance: FalAIProvider = Depends(get_fal_provider),
+    semaphore: asyncio.Semaphore = Depends(get_generation_semaphore)
 ):
     """Generate an image using the specified provider and model"""
     
     generation_id = str(uuid.uuid4())
     
-    # Get the provider
-    from backend.providers.fal_ai import FalAIProvider
-    from backend.config import settings
-    
-    if not settings.FAL_API_KEY:
-        raise HTTPException(status_code=400, detail="Fal.ai API key not configured")
-    
-    provider_instance = FalAIProvider(api_key=settings.FAL_API_KEY)
-    
     try:
-        result = await provider_instance.generate(
-            model=model,
-            prompt=prompt,
-            negative_prompt=negative_prompt,
-            width=width,
-            height=height,
-            steps=steps,
-            cfg_scale=cfg_scale,
-            seed=seed
-        )
+        async with semaphore:
+            result = await provider_instance.generate(
+                model=model,
+                prompt=prompt,
+                negative_prompt=negative_prompt,
+                width=width,
+                height=height,
+                steps=steps,
+                cfg_scale=cfg_scale,
+                seed=seed
+            )
         
         return {
             "generation_id": generation_id,
@@ -1,10 +1,71 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Response
 from typing import Optional, List
 import json
 import uuid
+import asyncio
+import logging
+import orjson
+import httpx
 from pydantic import BaseModel
 
+from backend.concurrency import get_generation_semaphore
+from backend.config import settings as app_settings
+from backend.providers.fal_ai import FalAIProvider
+from backend.http_clients import get_fal_client
+from backend.dependencies import get_fal_provider, get_gallery_manager
+from backend.gallery_manager import GalleryManager
+from backend.cache import make_key, cache_get, cache_set
+from backend.single_flight import SingleFlight
+from backend.utils.image_utils import spool
+
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Identical seeded WAN-25 requests arriving while one is still generating share its result
+wan25_flights = SingleFlight()
+
+# The model catalogue is static, so serialize it once at import time
+_MODELS_RESPONSE = {
+    "models": [
+        {
+            "id": "wan-25-preview",
+            "name": "WAN-25 Preview",
+            "description": "Advanced text-to-image generation with superior quality",
+            "provider": "fal_ai",
+            "features": [
+                "High-quality image generation",
+                "Multiple aspect ratios",
+                "Style presets",
+                "Advanced parameters"
+            ]
+        },
+        {
+            "id": "qwen-edit",
+            "name": "Qwen Image Edit Plus",
+            "description": "Advanced image editing with AI",
+            "provider": "fal_ai",
+            "features": [
+                "Intelligent object editing",
+                "Style preservation",
+                "Mask support",
+                "Multiple edit types"
+            ]
+        },
+        {
+            "id": "product-photoshoot",
+            "name": "Product Photoshoot",
+            "description": "Professional product photography generation",
+            "provider": "fal_ai",
+            "features": [
+                "Multiple scene types",
+                "Background removal",
+                "Lighting control",
+                "Batch processing"
+            ]
+        }
+    ]
+}
+_MODELS_JSON = orjson.dumps(_MODELS_RESPONSE)
 
 @router.post("/wan25")
 async def generate_wan25(
@@ -14,30 +75,40 @@ async def generate_wan25(
     quality: int = Form(80),
     style: Optional[str] = Form(None),
     negative_prompt: Optional[str] = Form(None),
-    seed: Optional[int] = Form(None)
+    seed: Optional[int] = Form(None),
+    provider: FalAIProvider = Depends(get_fal_provider),
+    semaphore: asyncio.Semaphore = Depends(get_generation_semaphore)
 ):
     """Generate image using WAN-25 Preview model"""
     generation_id = str(uuid.uuid4())
+    params = {
+        "prompt": prompt,
+        "aspect_ratio": aspect_ratio,
+        "output_format": output_format,
+        "quality": quality,
+        "style": style,
+        "negative_prompt": negative_prompt,
+        "seed": seed
+    }
     
-    from backend.providers.fal_ai import FalAIProvider
-    from backend.config import settings as app_settings
-    
-    if not app_settings.FAL_API_KEY:
-        raise HTTPException(status_code=400, detail="Fal.ai API key not configured")
+    # Only seeded requests are deterministic enough to serve from cache
+    cache_key = make_key({"model": "wan25", **params}) if seed is not None else None
     
-    provider = FalAIProvider(api_key=app_settings.FAL_API_KEY)
+    async def run() -> dict:
+        # Call the provider with the correct parameters
+        async with semaphore:
+            result = await provider.generate_wan25(**params)
+        if cache_key:
+            await cache_set(cache_key, result)
+        return result
     
     try:
-        # Call the provider with the correct parameters
-        result = await provider.generate_wan25(
-            prompt=prompt,
-            aspect_ratio=aspect_ratio,
-            output_format=output_format,
-            quality=quality,
-            style=style,
-            negative_prompt=negative_prompt,
-            seed=seed
-        )
+        if cache_key:
+            result = await cache_get(cache_key)
+            if result is None:
+                result = await wan25_flights.do(cache_key, run)
+        else:
+            result = await run()
         
         return {
             "generation_id": generation_id,
@@ -45,7 +116,7 @@ async def generate_wan25(
             "result": result
         }
     except Exception as e:
-        print(f"WAN-25 Generation Error: {str(e)}")
+        logger.exception("wan25 generation failed", extra={"generation_id": generation_id})
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/qwen-edit")
@@ -57,42 +128,45 @@ async def edit_with_qwen(
     edit_strength: float = Form(0.8),
     coherence: float = Form(0.7),
     auto_mask: bool = Form(True),
-    preserve_style: bool = Form(True)
+    preserve_style: bool = Form(True),
+    provider: FalAIProvider = Depends(get_fal_provider),
+    semaphore: asyncio.Semaphore = Depends(get_generation_semaphore)
 ):
     """Edit image using Qwen Image Edit Plus model"""
     generation_id = str(uuid.uuid4())
-    
-    from backend.providers.fal_ai import FalAIProvider
-    from backend.config import settings as app_settings
-    
-    if not app_settings.FAL_API_KEY:
-        raise HTTPException(status_code=400, detail="Fal.ai API key not configured")
-    
-    provider = FalAIProvider(api_key=app_settings.FAL_API_KEY)
+    image_data = mask_data = None
     
     try:
-        image_data = await image.read()
-        mask_data = await mask.read() if mask else None
+        # Spool uploads so large files spill to disk instead of sitting in RAM
+        image_data = await spool(image)
+        mask_data = await spool(mask) if mask else None
         
-        result = await provider.edit_qwen(
-            image=image_data,
-            instruction=instruction,
-            mask=mask_data,
-            edit_type=edit_type,
-            edit_strength=edit_strength,
-            coherence=coherence,
-            auto_mask=auto_mask,
-            preserve_style=preserve_style
-        )
+        async with semaphore:
+            result = await provider.edit_qwen(
+                image=image_data,
+                instruction=instruction,
+                mask=mask_data,
+                edit_type=edit_type,
+                edit_strength=edit_strength,
+                coherence=coherence,
+                auto_mask=auto_mask,
+                preserve_style=preserve_style
+            )
         
         return {
             "generation_id": generation_id,
             "status": "completed",
             "result": result
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Qwen Edit Error: {str(e)}")
+        logger.exception("qwen edit failed", extra={"generation_id": generation_id})
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for spooled in (image_data, mask_data):
+            if spooled is not None:
+                spooled.close()
 
 @router.post("/product-photoshoot")
 async def generate_product_shots(
@@ -111,135 +185,117 @@ async def generate_product_shots(
     resolution: str = Form("1024x1024"),
     batch_size: int = Form(1),
     add_watermark: bool = Form(False),
-    generate_variations: bool = Form(False)
+    generate_variations: bool = Form(False),
+    provider: FalAIProvider = Depends(get_fal_provider),
+    gallery_manager: GalleryManager = Depends(get_gallery_manager),
+    semaphore: asyncio.Semaphore = Depends(get_generation_semaphore)
 ):
     """Generate product photography using Product Photoshoot model"""
     generation_id = str(uuid.uuid4())
-    
-    from backend.providers.fal_ai import FalAIProvider
-    from backend.config import settings as app_settings
-    
-    if not app_settings.FAL_API_KEY:
-        raise HTTPException(status_code=400, detail="Fal.ai API key not configured")
-    
-    provider = FalAIProvider(api_key=app_settings.FAL_API_KEY)
+    images_data = []
     
     try:
-        images_data = [await img.read() for img in product_images]
+        # Close whichever spools succeeded if any upload fails (e.g. 413) before re-raising
+        results = await asyncio.gather(*(spool(img) for img in product_images), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            for r in results:
+                if not isinstance(r, BaseException):
+                    r.close()
+            raise errors[0]
+        images_data = results
         
         # Parse props if provided
         props_list = [p.strip() for p in props.split(',')] if props else None
         
-        result = await provider.generate_product_shoot(
-            product_images=images_data,
-            category=product_category,
-            description=product_description,
-            scene_type=scene_type,
-            background_style=background_style,
-            lighting_setup=lighting_setup,
-            props=props_list,
-            remove_background=remove_background,
-            preserve_shadows=preserve_shadows,
-            color_palette=color_palette,
-            reflection_intensity=reflection_intensity,
-            output_format=output_format,
-            resolution=resolution,
-            batch_size=batch_size
-        )
+        async with semaphore:
+            result = await provider.generate_product_shoot(
+                product_images=images_data,
+                category=product_category,
+                description=product_description,
+                scene_type=scene_type,
+                background_style=background_style,
+                lighting_setup=lighting_setup,
+                props=props_list,
+                remove_background=remove_background,
+                preserve_shadows=preserve_shadows,
+                color_palette=color_palette,
+                reflection_intensity=reflection_intensity,
+                output_format=output_format,
+                resolution=resolution,
+                batch_size=batch_size
+            )
+        
+        # Results are persisted in one batch so multi-image downloads overlap; a failed
+        # save is logged but doesn't fail the already-paid generation
+        if result.get("images"):
+            params = {"category": product_category, "scene_type": scene_type, "background_style": background_style}
+            try:
+                result["gallery"] = await gallery_manager.save_images_batch([
+                    (img["url"], product_description, "product-photoshoot", params)
+                    for img in result["images"]
+                ])
+            except Exception:
+                logger.exception("saving product shots to the gallery failed", extra={"generation_id": generation_id})
         
         return {
             "generation_id": generation_id,
             "status": "completed",
             "result": result
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Product Photoshoot Error: {str(e)}")
+        logger.exception("product photoshoot failed", extra={"generation_id": generation_id})
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for spooled in images_data:
+            spooled.close()
 
 @router.get("/models")
 async def get_available_models():
     """Get list of available enhanced models"""
-    return {
-        "models": [
-            {
-                "id": "wan-25-preview",
-                "name": "WAN-25 Preview",
-                "description": "Advanced text-to-image generation with superior quality",
-                "provider": "fal_ai",
-                "features": [
-                    "High-quality image generation",
-                    "Multiple aspect ratios",
-                    "Style presets",
-                    "Advanced parameters"
-                ]
-            },
-            {
-                "id": "qwen-edit",
-                "name": "Qwen Image Edit Plus",
-                "description": "Advanced image editing with AI",
-                "provider": "fal_ai",
-                "features": [
-                    "Intelligent object editing",
-                    "Style preservation",
-                    "Mask support",
-                    "Multiple edit types"
-                ]
-            },
-            {
-                "id": "product-photoshoot",
-                "name": "Product Photoshoot",
-                "description": "Professional product photography generation",
-                "provider": "fal_ai",
-                "features": [
-                    "Multiple scene types",
-                    "Background removal",
-                    "Lighting control",
-                    "Batch processing"
-                ]
-            }
-        ]
-    }
+    return Response(
+        content=_MODELS_JSON,
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=3600"}
+    )
 
 @router.get("/health")
 async def health_check():
     """Check if enhanced models are available"""
-    from backend.config import settings
-    
     return {
         "status": "healthy",
-        "fal_ai_configured": bool(settings.FAL_API_KEY),
+        "fal_ai_configured": bool(app_settings.FAL_API_KEY),
         "models_available": 3
     }
 
 @router.get("/test")
-async def test_api():
+async def test_api(client: httpx.AsyncClient = Depends(get_fal_client)):
     """Test if the API and Fal.ai key are working"""
-    from backend.config import settings
-    
     result = {
         "status": "ok",
-        "fal_api_key_configured": bool(settings.FAL_API_KEY),
-        "fal_api_key_length": len(settings.FAL_API_KEY) if settings.FAL_API_KEY else 0
+        "fal_api_key_configured": bool(app_settings.FAL_API_KEY),
+        "fal_api_key_length": len(app_settings.FAL_API_KEY) if app_settings.FAL_API_KEY else 0
     }
     
-    if settings.FAL_API_KEY:
+    if app_settings.FAL_API_KEY:
         # Test the API key with a simple request
         try:
-            import httpx
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                headers = {
-                    "Authorization": f"Key {settings.FAL_API_KEY}",
-                    "Content-Type": "application/json"
-                }
-                # Try to get user info or make a simple test request
-                response = await client.get(
-                    "https://queue.fal.run/fal-ai/flux/schnell",
-                    headers=headers
-                )
-                result["fal_api_test"] = {
-                    "status_code": response.status_code,
-                    "success": response.status_code in [200, 405, 422]  # These are "valid" responses
-                }
+            headers = {
+                "Authorization": f"Key {app_settings.FAL_API_KEY}",
+                "Content-Type": "application/json"
+            }
+            # Try to get user info or make a simple test request
+            response = await client.get(
+                "https://queue.fal.run/fal-ai/flux/schnell",
+                headers=headers,
+                timeout=10.0
+            )
+            result["fal_api_test"] = {
+                "status_code": response.status_code,
+                "success": response.status_code in [200, 405, 422]  # These are "valid" responses
+            }
         except Exception as e:
             result["fal_api_test"] = {
                 "error": str(e)
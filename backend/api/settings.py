@@ -1,16 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from pydantic import BaseModel
 
+from backend.config import settings as app_settings
+
 router = APIRouter()
 
-@router.get("/settings")
-async def get_settings():
-    """Get application settings"""
-    from backend.config import settings as app_settings
+def build_settings_payload() -> dict:
+    """Settings are fixed for the process lifetime, so this is serialized once at startup"""
     return {
         "app_name": app_settings.APP_NAME,
         "version": app_settings.VERSION,
         "providers": {
             "fal_ai": {"configured": bool(app_settings.FAL_API_KEY)}
         }
-    }
\ No newline at end of file
+    }
+
+@router.get("/settings")
+async def get_settings(request: Request):
+    """Get application settings"""
+    return Response(content=request.app.state.settings_json, media_type="application/json")
\ No newline at end of file
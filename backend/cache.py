@@ -0,0 +1,99 @@
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+from backend.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional; fall back to an in-process cache
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# One week; generations with a fixed seed are reproducible, so results stay valid
+DEFAULT_TTL = 7 * 86400
+# Entry cap for the in-process fallback; least recently used results are evicted first
+MEMORY_CACHE_SIZE = 512
+
+_redis = None
+_memory: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+
+def make_key(params: Dict[str, Any]) -> str:
+    """Build a stable cache key from the full set of request parameters"""
+    digest = hashlib.blake2b(orjson.dumps(params, option=orjson.OPT_SORT_KEYS), digest_size=16)
+    return f"gen:{digest.hexdigest()}"
+
+
+async def init_cache():
+    """Connect to Redis when REDIS_URL is configured"""
+    global _redis
+    if settings.REDIS_URL and aioredis is not None:
+        _redis = aioredis.from_url(settings.REDIS_URL)
+        logger.info("Response cache using Redis")
+    elif settings.REDIS_URL:
+        logger.warning("REDIS_URL is set but redis is not installed; using in-memory cache")
+
+
+async def close_cache():
+    """Close the Redis connection if one was opened"""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+async def cache_get(key: str) -> Optional[Any]:
+    """Return the cached value for key, or None on a miss or cache failure"""
+    try:
+        if _redis is not None:
+            raw = await _redis.get(key)
+        else:
+            raw = _memory_get(key)
+        return orjson.loads(raw) if raw is not None else None
+    except Exception as e:
+        # The cache is an optimisation; an outage must not fail the request
+        logger.warning(f"Cache read failed for {key}: {e}")
+        return None
+
+
+async def cache_set(key: str, value: Any, ttl: int = DEFAULT_TTL):
+    """Store value under key for ttl seconds; failures are logged and ignored"""
+    try:
+        raw = orjson.dumps(value)
+        if _redis is not None:
+            await _redis.set(key, raw, ex=ttl)
+        else:
+            _memory_set(key, raw, ttl)
+    except Exception as e:
+        logger.warning(f"Cache write failed for {key}: {e}")
+
+
+def _memory_get(key: str) -> Optional[bytes]:
+    entry = _memory.get(key)
+    if entry is None:
+        return None
+    expires, raw = entry
+    if expires < time.monotonic():
+        del _memory[key]
+        return None
+    _memory.move_to_end(key)
+    return raw
+
+
+def _memory_set(key: str, raw: bytes, ttl: int):
+    now = time.monotonic()
+    _memory[key] = (now + ttl, raw)
+    _memory.move_to_end(key)
+    # Drop expired entries from the cold end, then enforce the size cap
+    while _memory:
+        oldest = next(iter(_memory))
+        expires, _ = _memory[oldest]
+        if expires >= now and len(_memory) <= MEMORY_CACHE_SIZE:
+            break
+        del _memory[oldest]
@@ -0,0 +1,14 @@
+import asyncio
+
+from backend.config import settings
+
+# Caps the number of in-flight provider calls across all generation endpoints
+GENERATION_SEMAPHORE = asyncio.BoundedSemaphore(settings.MAX_CONCURRENT_GENERATIONS)
+
+# Caps parallel thumbnail decode/resample work so large images can't spike memory
+THUMBNAIL_SEMAPHORE = asyncio.Semaphore(2)
+
+
+def get_generation_semaphore() -> asyncio.Semaphore:
+    """Semaphore held around provider calls; override via app.dependency_overrides"""
+    return GENERATION_SEMAPHORE
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 from pathlib import Path
 
 class Settings(BaseSettings):
@@ -7,6 +7,7 @@ class Settings(BaseSettings):
     APP_NAME: str = "AI Image Generator"
     VERSION: str = "1.0.0"
     DEBUG: bool = False
+    LOG_JSON: bool = False
     
     # Server
     HOST: str = "127.0.0.1"
@@ -18,8 +19,19 @@ class Settings(BaseSettings):
     # Security
     SECRET_KEY: str = "CHANGE_THIS_TO_A_RANDOM_SECRET_KEY"
     
+    # Cache (optional; an in-memory cache is used when unset)
+    REDIS_URL: Optional[str] = None
+    
     # Storage
     STORAGE_PATH: Path = Path("./storage")
+    TEMP_DIR: str = "temp"
+    MAX_UPLOAD_SIZE: int = 25 * 1024 * 1024
+    
+    # Generation
+    MAX_CONCURRENT_GENERATIONS: int = 3
+    
+    # Outbound HTTP (seconds per stage, passed to httpx.Timeout)
+    HTTP_TIMEOUTS: Dict[str, float] = {"connect": 3.0, "read": 30.0, "write": 10.0, "pool": 5.0}
     
     # API Keys (from environment)
     FAL_API_KEY: Optional[str] = None
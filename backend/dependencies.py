@@ -0,0 +1,27 @@
+from fastapi import HTTPException, Request
+
+from backend.config import settings
+from backend.providers.fal_ai import FalAIProvider
+from backend.gallery_manager import GalleryManager
+
+
+def _fal_provider(request: Request) -> FalAIProvider:
+    """Return the app-wide Fal.ai provider"""
+    return request.app.state.fal_provider
+
+
+def _fal_unavailable(request: Request) -> FalAIProvider:
+    """Stand-in dependency used when the app started without a Fal.ai key"""
+    raise HTTPException(status_code=503, detail="Fal.ai API key not configured")
+
+
+# The key is fixed for the process lifetime, so pick the dependency once instead of checking per request
+get_fal_provider = _fal_provider if settings.FAL_API_KEY else _fal_unavailable
+
+
+def get_gallery_manager(request: Request) -> GalleryManager:
+    """Return the app-wide gallery manager built at startup"""
+    manager = getattr(request.app.state, "gallery_manager", None)
+    if manager is None:
+        raise HTTPException(status_code=503, detail="Gallery storage is unavailable")
+    return manager
@@ -1,86 +1,202 @@
 ﻿from pathlib import Path
-import json
+import os
+import mmap
+import time
+import uuid
 import shutil
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple, Union
 from PIL import Image
 import io
+import asyncio
 import httpx
+import aiofiles
+import orjson
+
+from backend.database import SessionLocal, engine
+from backend.models import GalleryImage
+
+try:
+    import pyvips
+except ImportError:  # libvips is optional; Pillow is the fallback
+    pyvips = None
+
+THUMBNAIL_EDGE = 256
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+def _new_filename() -> str:
+    """Time-sortable, collision-safe image filename (nanosecond prefix + random suffix)"""
+    return f"img_{time.time_ns():016x}_{uuid.uuid4().hex[:12]}.png"
+
+def _write_thumbnail(source: Union[bytes, Path], thumb_path: Path):
+    """Downscale image bytes or a saved image to a thumbnail file, preferring libvips"""
+    if pyvips is not None:
+        if isinstance(source, bytes):
+            thumb = pyvips.Image.thumbnail_buffer(source, THUMBNAIL_EDGE)
+        else:
+            thumb = pyvips.Image.thumbnail(str(source), THUMBNAIL_EDGE)
+        thumb.write_to_file(str(thumb_path))
+        return
+    
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+        img.thumbnail((THUMBNAIL_EDGE, THUMBNAIL_EDGE), Image.Resampling.LANCZOS)
+        img.save(thumb_path)
 
 class GalleryManager:
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        # Shared download client (app.state.download_client); falls back to a one-off client
+        self.client = client
         self.storage_path = Path("storage/images")
         self.metadata_path = Path("storage/metadata.json")
         self.storage_path.mkdir(parents=True, exist_ok=True)
-        self.load_metadata()
+        GalleryImage.__table__.create(bind=engine, checkfirst=True)
+        self.import_legacy_metadata()
+    
+    def import_legacy_metadata(self):
+        """One-time import of the old metadata.json into the gallery table"""
+        if not self.metadata_path.exists():
+            return
+        
+        with SessionLocal() as session:
+            if session.query(GalleryImage.id).first() is not None:
+                return
+            
+            # orjson parses straight from the memory map without a heap copy of the file
+            with open(self.metadata_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                    legacy = orjson.loads(view)
+            
+            for img in legacy.get("images", []):
+                session.add(GalleryImage(
+                    id=img["id"],
+                    filename=img["filename"],
+                    thumbnail=img.get("thumbnail"),
+                    prompt=img.get("prompt"),
+                    model=img.get("model"),
+                    params=img.get("params", {}),
+                    created_at=datetime.fromisoformat(img["created_at"]),
+                    tags=img.get("tags", []),
+                    favorite=img.get("favorite", False)
+                ))
+            session.commit()
+    
+    async def _stream_to_file(self, client: httpx.AsyncClient, image_url: str, filepath: Path):
+        # Stream to a .part file and rename on success so error bodies and partial images never land
+        part_path = filepath.with_name(filepath.name + ".part")
+        try:
+            async with client.stream("GET", image_url) as response:
+                response.raise_for_status()
+                async with aiofiles.open(part_path, 'wb') as f:
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        await f.write(chunk)
+            os.replace(part_path, filepath)
+        except BaseException:
+            part_path.unlink(missing_ok=True)
+            raise
     
-    def load_metadata(self):
-        """Load image metadata from JSON file"""
-        if self.metadata_path.exists():
-            with open(self.metadata_path, 'r') as f:
-                self.metadata = json.load(f)
+    async def _download(self, image_url: str, filepath: Path):
+        """Stream an image straight to disk, reusing the shared download client when available"""
+        if self.client is not None:
+            await self._stream_to_file(self.client, image_url, filepath)
         else:
-            self.metadata = {"images": []}
+            async with httpx.AsyncClient() as client:
+                await self._stream_to_file(client, image_url, filepath)
     
-    def save_metadata(self):
-        """Save metadata to JSON file"""
-        with open(self.metadata_path, 'w') as f:
-            json.dump(self.metadata, f, indent=2)
+    async def save_images_batch(self, items: List[Tuple[str, str, str, dict]]) -> List[dict]:
+        """Save several (url, prompt, model, params) results with overlapping downloads and one commit"""
+        filenames = [_new_filename() for _ in items]
+        
+        results = await asyncio.gather(*(
+            self._download(url, self.storage_path / filename)
+            for filename, (url, _, _, _) in zip(filenames, items)
+        ), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        
+        try:
+            if errors:
+                raise errors[0]
+            await asyncio.gather(*(self.create_thumbnail(filename) for filename in filenames))
+            return await asyncio.to_thread(self._insert_images, [
+                (filename, prompt, model, params)
+                for filename, (_, prompt, model, params) in zip(filenames, items)
+            ])
+        except BaseException:
+            # Don't leave the sibling downloads orphaned on disk without gallery rows
+            for filename in filenames:
+                (self.storage_path / filename).unlink(missing_ok=True)
+                (self.storage_path / f"thumb_{filename}").unlink(missing_ok=True)
+            raise
     
-    async def save_image(self, image_url: str, prompt: str, model: str, params: dict) -> dict:
-        """Download and save image with metadata"""
+    async def save_image(
+        self,
+        image_url: str,
+        prompt: str,
+        model: str,
+        params: dict,
+        create_thumbnail: bool = True
+    ) -> dict:
+        """Download and save image with metadata; pass create_thumbnail=False to defer the thumbnail"""
         # Generate filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"img_{timestamp}_{len(self.metadata['images'])}.png"
+        filename = _new_filename()
         filepath = self.storage_path / filename
         
-        # Download image
-        async with httpx.AsyncClient() as client:
-            response = await client.get(image_url)
-            image_data = response.content
-        
-        # Save full size
-        with open(filepath, 'wb') as f:
-            f.write(image_data)
-        
-        # Create thumbnail
-        thumb_path = self.storage_path / f"thumb_{filename}"
-        img = Image.open(io.BytesIO(image_data))
-        img.thumbnail((256, 256), Image.Resampling.LANCZOS)
-        img.save(thumb_path)
-        
-        # Save metadata
-        image_info = {
-            "id": len(self.metadata['images']) + 1,
-            "filename": filename,
-            "thumbnail": f"thumb_{filename}",
-            "prompt": prompt,
-            "model": model,
-            "params": params,
-            "created_at": datetime.now().isoformat(),
-            "tags": [],
-            "favorite": False
-        }
+        # Download straight to disk so the full image never sits in memory
+        await self._download(image_url, filepath)
         
-        self.metadata['images'].insert(0, image_info)
-        self.save_metadata()
+        # Create thumbnail off the event loop
+        if create_thumbnail:
+            await self.create_thumbnail(filename)
         
-        return image_info
+        # Save metadata without blocking the event loop on SQLite
+        (image,) = await asyncio.to_thread(self._insert_images, [(filename, prompt, model, params)])
+        return image
+    
+    def _insert_images(self, rows: List[Tuple[str, str, str, dict]]) -> List[dict]:
+        """Insert (filename, prompt, model, params) rows in one commit; runs in a worker thread"""
+        with SessionLocal() as session:
+            images = [
+                GalleryImage(
+                    filename=filename,
+                    thumbnail=f"thumb_{filename}",
+                    prompt=prompt,
+                    model=model,
+                    params=params,
+                    tags=[],
+                    favorite=False
+                )
+                for filename, prompt, model, params in rows
+            ]
+            session.add_all(images)
+            session.commit()
+            return [image.to_dict() for image in images]
+    
+    async def create_thumbnail(self, filename: str):
+        """Build the thumbnail for an already-saved image"""
+        await asyncio.to_thread(
+            _write_thumbnail,
+            self.storage_path / filename,
+            self.storage_path / f"thumb_{filename}"
+        )
     
     def get_gallery(self, limit: int = 50, filter_by: str = None) -> List[Dict]:
         """Get gallery images with optional filtering"""
-        images = self.metadata.get('images', [])
-        
-        if filter_by == 'favorites':
-            images = [img for img in images if img.get('favorite')]
-        
-        return images[:limit]
+        with SessionLocal() as session:
+            query = session.query(GalleryImage)
+            
+            if filter_by == 'favorites':
+                query = query.filter_by(favorite=True)
+            
+            images = query.order_by(GalleryImage.created_at.desc()).limit(limit).all()
+            return [img.to_dict() for img in images]
     
     def toggle_favorite(self, image_id: int) -> bool:
         """Toggle favorite status of an image"""
-        for img in self.metadata['images']:
-            if img['id'] == image_id:
-                img['favorite'] = not img['favorite']
-                self.save_metadata()
-                return img['favorite']
-        return False
+        with SessionLocal() as session:
+            image = session.get(GalleryImage, image_id)
+            if image is None:
+                return False
+            image.favorite = not image.favorite
+            session.commit()
+            return image.favorite
@@ -0,0 +1,43 @@
+import httpx
+from fastapi import FastAPI, Request
+
+from backend.config import settings
+
+# Fal.ai multiplexes over a few HTTP/2 connections; keep them warm between bursts
+FAL_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=300)
+DEFAULT_LIMITS = httpx.Limits(max_keepalive_connections=100, max_connections=1000)
+
+
+def build_client(limits: httpx.Limits = DEFAULT_LIMITS) -> httpx.AsyncClient:
+    """Create a pooled HTTP client meant to live for the whole app lifetime"""
+    # HTTP/2 multiplexes polls and downloads over one connection; brotli needs the brotli package
+    return httpx.AsyncClient(
+        http2=True,
+        headers={"Accept-Encoding": "br, gzip"},
+        limits=limits,
+        timeout=httpx.Timeout(**settings.HTTP_TIMEOUTS)
+    )
+
+
+def open_clients(app: FastAPI):
+    """Attach the shared Fal.ai and download clients to app.state"""
+    app.state.fal_client = build_client(FAL_LIMITS)
+    app.state.download_client = build_client()
+
+
+async def close_clients(app: FastAPI):
+    """Close the shared clients on shutdown"""
+    for name in ("fal_client", "download_client"):
+        client = getattr(app.state, name, None)
+        if client is not None:
+            await client.aclose()
+
+
+def get_fal_client(request: Request) -> httpx.AsyncClient:
+    """Dependency returning the shared client for Fal.ai API calls"""
+    return request.app.state.fal_client
+
+
+def get_download_client(request: Request) -> httpx.AsyncClient:
+    """Dependency returning the shared client for fetching result images"""
+    return request.app.state.download_client
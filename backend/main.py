@@ -1,12 +1,14 @@
-﻿from fastapi import FastAPI, HTTPException
+﻿from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse
 from pathlib import Path
 from contextlib import asynccontextmanager
+import importlib
 import logging
 import sys
 import os
+import orjson
 
 # Add backend to path if not already there
 backend_path = Path(__file__).parent.parent
@@ -15,16 +17,78 @@ if str(backend_path) not in sys.path:
 
 from backend.database import engine, Base
 from backend.config import settings
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from backend.utils.log_utils import setup_logging
+from backend.http_clients import open_clients, close_clients
+from backend.cache import init_cache, close_cache
+from backend.api.settings import build_settings_payload
+from backend.providers.fal_ai import FalAIProvider
+from backend.gallery_manager import GalleryManager
+
+# Configure logging; records are formatted and written on a background thread
+log_listener = setup_logging(logging.INFO, json_output=settings.LOG_JSON)
 logger = logging.getLogger(__name__)
 
+def _build_providers() -> list:
+    """Provider list; only depends on which API keys are configured"""
+    return [
+        {
+            "id": "fal_ai",
+            "name": "Fal.ai",
+            "status": "active" if settings.FAL_API_KEY else "not_configured",
+            "models": [
+                {"id": "flux-pro", "name": "Flux Pro"},
+                {"id": "flux-dev", "name": "Flux Dev"},
+                {"id": "flux-schnell", "name": "Flux Schnell"},
+                {"id": "wan-25-preview", "name": "WAN-25 Preview"},
+                {"id": "qwen-edit", "name": "Qwen Image Edit Plus"},
+                {"id": "product-photoshoot", "name": "Product Photoshoot"}
+            ]
+        },
+        {
+            "id": "replicate",
+            "name": "Replicate",
+            "status": "active" if settings.REPLICATE_API_TOKEN else "not_configured",
+            "models": []
+        },
+        {
+            "id": "openai",
+            "name": "OpenAI",
+            "status": "active" if settings.OPENAI_API_KEY else "not_configured",
+            "models": []
+        }
+    ]
+
+def _snapshot_routes(app: FastAPI) -> bytes:
+    """Serialize the route table; it is fixed once the routers are mounted"""
+    routes = []
+    for route in app.routes:
+        if hasattr(route, "path"):
+            routes.append({
+                "path": route.path,
+                "name": route.name,
+                "methods": sorted(route.methods) if getattr(route, "methods", None) else None
+            })
+    return orjson.dumps(routes)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifecycle"""
     # Startup
     logger.info("Starting AI Image Generator...")
+    if not settings.FAL_API_KEY:
+        logger.warning("FAL_API_KEY missing; Fal.ai generation endpoints will return 503")
+    
+    # Shared outbound HTTP clients so requests reuse pooled connections
+    open_clients(app)
+    await init_cache()
+    
+    # Static responses are serialized once; they only change with configuration
+    app.state.providers_json = orjson.dumps(_build_providers())
+    app.state.settings_json = orjson.dumps(build_settings_payload())
+    app.state.routes_json = _snapshot_routes(app)
+    
+    # One provider instance for every request, riding on the shared client
+    app.state.fal_provider = FalAIProvider(api_key=settings.FAL_API_KEY, client=app.state.fal_client)
     
     # Create database tables
     try:
@@ -33,10 +97,15 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Database initialization warning: {e}")
     
+    # Built once here: construction creates the gallery table and imports legacy metadata
+    try:
+        app.state.gallery_manager = GalleryManager(client=app.state.download_client)
+    except Exception as e:
+        logger.warning(f"Gallery initialization warning: {e}")
+    
     # Setup storage directories
     try:
-        from backend.utils.file_manager import FileManager
-        file_manager = FileManager()
+        from backend.utils.file_manager import file_manager
         file_manager.setup_directories()
         logger.info("Storage directories initialized")
     except Exception as e:
@@ -46,12 +115,17 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down...")
+    await app.state.fal_provider.aclose()
+    await close_clients(app)
+    await close_cache()
+    log_listener.stop()
 
 # Create FastAPI app
 app = FastAPI(
     title="AI Image Generator API",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -73,44 +147,26 @@ if frontend_path.exists():
 if storage_path.exists():
     app.mount("/storage", StaticFiles(directory=str(storage_path)), name="storage")
 
-# Try to import and include routers
-try:
-    from backend.api import generation
-    app.include_router(generation.router, prefix="/api", tags=["generation"])
-    logger.info("Generation router included")
-except Exception as e:
-    logger.warning(f"Could not include generation router: {e}")
-
-try:
-    from backend.api import gallery
-    app.include_router(gallery.router, prefix="/api", tags=["gallery"])
-    logger.info("Gallery router included")
-except Exception as e:
-    logger.warning(f"Could not include gallery router: {e}")
-
-try:
-    from backend.api import projects
-    app.include_router(projects.router, prefix="/api", tags=["projects"])
-    logger.info("Projects router included")
-except Exception as e:
-    logger.warning(f"Could not include projects router: {e}")
-
-try:
-    from backend.api import settings as settings_api
-    app.include_router(settings_api.router, prefix="/api", tags=["settings"])
-    logger.info("Settings router included")
-except Exception as e:
-    logger.warning(f"Could not include settings router: {e}")
-
-# Import and include the extended generation router
-try:
-    from backend.api import generation_extended
-    app.include_router(generation_extended.router, prefix="/api/extended", tags=["extended"])
-    logger.info("Extended generation router included successfully!")
-except ImportError as e:
-    logger.error(f"Could not import generation_extended: {e}")
-except Exception as e:
-    logger.error(f"Could not include extended generation router: {e}")
+# Routers are optional during development, so a broken one is logged rather than fatal
+ROUTERS = [
+    ("generation", "/api", "generation"),
+    ("gallery", "/api", "gallery"),
+    ("projects", "/api", "projects"),
+    ("settings", "/api", "settings"),
+    ("generation_extended", "/api/extended", "extended"),
+]
+
+def _safe_include(app: FastAPI, name: str, prefix: str, tag: str):
+    """Import backend.api.<name> and mount its router, logging any failure"""
+    try:
+        module = importlib.import_module(f"backend.api.{name}")
+        app.include_router(module.router, prefix=prefix, tags=[tag])
+        logger.info(f"{name} router included")
+    except Exception as e:
+        logger.warning(f"Could not include {name} router: {e}")
+
+for name, prefix, tag in ROUTERS:
+    _safe_include(app, name, prefix, tag)
 
 @app.get("/")
 async def root():
@@ -149,44 +205,10 @@ async def product_page():
 @app.get("/api/providers")
 async def get_providers():
     """Get list of available providers"""
-    return [
-        {
-            "id": "fal_ai",
-            "name": "Fal.ai",
-            "status": "active" if settings.FAL_API_KEY else "not_configured",
-            "models": [
-                {"id": "flux-pro", "name": "Flux Pro"},
-                {"id": "flux-dev", "name": "Flux Dev"},
-                {"id": "flux-schnell", "name": "Flux Schnell"},
-                {"id": "wan-25-preview", "name": "WAN-25 Preview"},
-                {"id": "qwen-edit", "name": "Qwen Image Edit Plus"},
-                {"id": "product-photoshoot", "name": "Product Photoshoot"}
-            ]
-        },
-        {
-            "id": "replicate",
-            "name": "Replicate",
-            "status": "active" if settings.REPLICATE_API_TOKEN else "not_configured",
-            "models": []
-        },
-        {
-            "id": "openai",
-            "name": "OpenAI",
-            "status": "active" if settings.OPENAI_API_KEY else "not_configured",
-            "models": []
-        }
-    ]
+    return Response(content=app.state.providers_json, media_type="application/json")
 
 # Debug endpoint to check loaded routes
 @app.get("/api/routes")
 async def get_routes():
     """Get all registered routes for debugging"""
-    routes = []
-    for route in app.routes:
-        if hasattr(route, "path"):
-            routes.append({
-                "path": route.path,
-                "name": route.name,
-                "methods": route.methods if hasattr(route, "methods") else None
-            })
-    return routes
\ No newline at end of file
+    return Response(content=app.state.routes_json, media_type="application/json")
\ No newline at end of file
@@ -1,2 +1,32 @@
-from sqlalchemy.ext.declarative import declarative_base
-Base = declarative_base()
\ No newline at end of file
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, JSON
+
+from backend.database import Base
+
+
+class GalleryImage(Base):
+    __tablename__ = "gallery_images"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String(255), nullable=False)
+    thumbnail = Column(String(255))
+    prompt = Column(Text)
+    model = Column(String(100))
+    params = Column(JSON, default=dict)
+    created_at = Column(DateTime, default=datetime.now, index=True)
+    favorite = Column(Boolean, default=False, index=True)
+    tags = Column(JSON, default=list)
+    
+    def to_dict(self) -> dict:
+        """Serialize in the shape the JSON gallery used to return"""
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "thumbnail": self.thumbnail,
+            "prompt": self.prompt,
+            "model": self.model,
+            "params": self.params,
+            "created_at": self.created_at.isoformat(),
+            "tags": self.tags,
+            "favorite": self.favorite
+        }
\ No newline at end of file
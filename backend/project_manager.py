@@ -1,17 +1,25 @@
-﻿import json
+﻿import os
+import asyncio
+import orjson
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional
 
+# Mutations within this window are coalesced into a single write
+FLUSH_DELAY = 0.1
+
 class ProjectManager:
     def __init__(self):
         self.projects_file = Path("storage/projects.json")
+        self._dirty = False
+        self._flush_task: Optional[asyncio.Task] = None
         self.load_projects()
     
     def load_projects(self):
         if self.projects_file.exists():
-            with open(self.projects_file, 'r') as f:
-                self.projects = json.load(f)
+            with open(self.projects_file, 'rb') as f:
+                self.projects = orjson.loads(f.read())
+            self._reindex()
         else:
             self.projects = {
                 "projects": [
@@ -24,16 +32,51 @@ class ProjectManager:
                     }
                 ]
             }
+            self._reindex()
             self.save_projects()
     
+    def _reindex(self):
+        """Build the id -> project index and next-id counter over the loaded projects"""
+        self._by_id: Dict[int, Dict] = {p["id"]: p for p in self.projects["projects"]}
+        self._next_id = max(self._by_id, default=0) + 1
+    
     def save_projects(self):
         self.projects_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.projects_file, 'w') as f:
-            json.dump(self.projects, f, indent=2)
+        # Write aside and swap in atomically so a crash can't leave a truncated file.
+        # No fsync: this is advisory metadata and the OS may flush when it likes.
+        tmp = self.projects_file.with_suffix('.json.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(orjson.dumps(self.projects, option=orjson.OPT_INDENT_2))
+        os.replace(tmp, self.projects_file)
+        self._dirty = False
+    
+    def _schedule_flush(self):
+        """Mark projects dirty and write them once after FLUSH_DELAY"""
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, CLI): write through immediately
+            self.save_projects()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._delayed_flush())
+    
+    async def _delayed_flush(self):
+        await asyncio.sleep(FLUSH_DELAY)
+        if self._dirty:
+            self.save_projects()
+    
+    async def flush(self):
+        """Write any pending changes now; call on shutdown so nothing is lost"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        if self._dirty:
+            self.save_projects()
     
     def create_project(self, name: str, description: str = "") -> Dict:
         new_project = {
-            "id": len(self.projects["projects"]) + 1,
+            "id": self._next_id,
             "name": name,
             "description": description,
             "created_at": datetime.now().isoformat(),
@@ -42,6 +85,8 @@ class ProjectManager:
             "is_active": True
         }
         self.projects["projects"].append(new_project)
+        self._by_id[new_project["id"]] = new_project
+        self._next_id += 1
         self.save_projects()
         return new_project
     
@@ -52,20 +97,18 @@ class ProjectManager:
         return projects
     
     def update_project(self, project_id: int, updates: Dict) -> Optional[Dict]:
-        for project in self.projects["projects"]:
-            if project["id"] == project_id:
-                project.update(updates)
-                self.save_projects()
-                return project
-        return None
+        project = self._by_id.get(project_id)
+        if project is None:
+            return None
+        project.update(updates)
+        self._schedule_flush()
+        return project
     
     def add_image_to_project(self, project_id: int, image_id: int):
-        for project in self.projects["projects"]:
-            if project["id"] == project_id:
-                project["image_count"] += 1
-                if "image_ids" not in project:
-                    project["image_ids"] = []
-                project["image_ids"].append(image_id)
-                self.save_projects()
-                return True
-        return False
+        project = self._by_id.get(project_id)
+        if project is None:
+            return False
+        project["image_count"] += 1
+        project.setdefault("image_ids", []).append(image_id)
+        self._schedule_flush()
+        return True
@@ -1,27 +1,172 @@
 import httpx
-import base64
-import json
+import orjson
 import asyncio
-import tempfile
-import os
-from typing import Dict, Any, Optional, List
+import math
+import random
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Union, BinaryIO
 from backend.providers.base import BaseProvider
+from backend.utils.b64 import b64encode
 import logging
 from PIL import Image
 import io
 
+try:
+    import numpy as np
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJSAMP_420
+    _tj = TurboJPEG()
+except (ImportError, OSError):  # libjpeg-turbo is optional; Pillow is the fallback
+    _tj = None
+
 logger = logging.getLogger(__name__)
 
+BytesIO = io.BytesIO
+LANCZOS = Image.Resampling.LANCZOS
+
+FAL_BASE_URL = "https://fal.run"
+
+# Map model names to Fal.ai endpoints
+_MODEL_MAP = {
+    "flux-pro": "fal-ai/flux-pro",
+    "flux-dev": "fal-ai/flux/dev",
+    "flux-schnell": "fal-ai/flux/schnell"
+}
+_MODEL_URLS = {model: f"{FAL_BASE_URL}/{endpoint}" for model, endpoint in _MODEL_MAP.items()}
+_DEFAULT_MODEL_URL = _MODEL_URLS["flux-schnell"]
+
+_MODELS = [
+    {"id": "flux-schnell", "name": "Flux Schnell", "type": "text-to-image"},
+    {"id": "flux-dev", "name": "Flux Dev", "type": "text-to-image"},
+    {"id": "flux-pro", "name": "Flux Pro", "type": "text-to-image"},
+    {"id": "qwen-edit", "name": "Qwen Image Edit Plus", "type": "image-edit"},
+    {"id": "product-photoshoot", "name": "Product Photoshoot", "type": "product"},
+    {
+        "id": "wan-25-i2v",
+        "name": "WAN 2.5 Image-to-Video",
+        "description": "Transform images into dynamic videos with native audio generation",
+        "type": "image-to-video",
+        "features": ["audio_generation", "camera_control", "motion_control"]
+    }
+]
+
+# Map aspect ratios to dimensions
+_ASPECT_MAP = {
+    "1:1": (1024, 1024),
+    "16:9": (1344, 768),
+    "9:16": (768, 1344),
+    "4:3": (1152, 896),
+    "3:4": (896, 1152)
+}
+
+def _json_body(payload: Dict[str, Any], data_urls: Dict[str, Any]) -> bytes:
+    """Serialize payload with orjson and splice in base64 data URLs as raw bytes.
+    
+    data_urls maps a field to (mime, base64_bytes) or a list of those. Base64 needs no
+    JSON escaping, so each encoded image is copied exactly once, into the final body.
+    """
+    head = orjson.dumps(payload)[:-1]
+    parts = [head]
+    sep = b"," if len(head) > 1 else b""
+    for field, value in data_urls.items():
+        items = value if isinstance(value, list) else [value]
+        parts += [sep, b'"', field.encode(), b'":', b"[" if isinstance(value, list) else b""]
+        for i, (mime, encoded) in enumerate(items):
+            parts += [b"," if i else b"", b'"data:', mime.encode(), b";base64,", encoded, b'"']
+        parts.append(b"]" if isinstance(value, list) else b"")
+        sep = b","
+    parts.append(b"}")
+    return b"".join(parts)
+
+def _encode_jpeg(img: Image.Image, quality: int) -> bytes:
+    """JPEG-encode with 4:2:0 subsampling, via libjpeg-turbo when available"""
+    if _tj is not None and img.mode == 'RGB':
+        return _tj.encode(np.asarray(img), quality=quality, pixel_format=TJPF_RGB, jpeg_subsample=TJSAMP_420)
+    buffer = BytesIO()
+    img.save(buffer, format='JPEG', quality=quality, optimize=True, subsampling=2, progressive=False)
+    return buffer.getvalue()
+
+def _snippet(content: bytes, limit: int = 500) -> str:
+    """Decode only the head of a response body for logging"""
+    return content[:limit].decode('utf-8', errors='replace')
+
+@lru_cache(maxsize=128)
+def _build_scene(scene_type: str, background_style: str, lighting_setup: str) -> str:
+    """Product photoshoot scene description for a style combination"""
+    return f"an image with a professional {scene_type} photography setting, featuring {background_style} background and {lighting_setup} lighting setup for product photography"
+
+def _read_image(image: Union[bytes, BinaryIO]) -> bytes:
+    """Return image bytes from raw bytes or a spooled upload file"""
+    if isinstance(image, bytes):
+        return image
+    image.seek(0)
+    return image.read()
+
 class FalAIProvider(BaseProvider):
     """Fal.ai provider implementation"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, client: Optional[httpx.AsyncClient] = None):
         super().__init__(api_key)
-        self.base_url = "https://fal.run"
+        self.base_url = FAL_BASE_URL
         self.headers = {
             "Authorization": f"Key {api_key}",
             "Content-Type": "application/json"
         }
+        # A client passed in is shared (e.g. app.state.fal_client) and closed by its owner
+        self._owns_client = client is None
+        if client is None:
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=httpx.Timeout(connect=10.0, read=180.0, write=30.0, pool=5.0),
+                http2=True,
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=300)
+            )
+        self._client = client
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Persistent HTTP client so connections to Fal.ai are pooled across requests"""
+        return self._client
+    
+    async def aclose(self):
+        """Close the pooled HTTP client if this provider created it"""
+        if self._owns_client:
+            await self._client.aclose()
+    
+    async def _post_json(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        timeout: float,
+        data_urls: Optional[Dict[str, Any]] = None,
+        max_attempts: int = 1
+    ) -> httpx.Response:
+        """POST a payload serialized with orjson rather than httpx's stdlib json path"""
+        body = _json_body(payload, data_urls) if data_urls else orjson.dumps(payload)
+        return await self._post_with_retries(url, body, timeout, max_attempts)
+    
+    async def _post_with_retries(
+        self,
+        url: str,
+        content: bytes,
+        timeout: float,
+        max_attempts: int = 3
+    ) -> httpx.Response:
+        """POST an already-encoded body, retrying 5xx and connect failures with capped backoff"""
+        for attempt in range(max_attempts):
+            last = attempt == max_attempts - 1
+            try:
+                response = await self.client.post(url, content=content, headers=self.headers, timeout=timeout)
+                if response.status_code < 500 or last:
+                    return response
+                logger.warning(f"Fal.ai returned {response.status_code}, retrying ({attempt + 1}/{max_attempts})")
+            # Only connect-phase failures are retried: the request never reached Fal.ai, so it
+            # can't have been billed. Read/write timeouts on a generation POST surface immediately.
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                if last:
+                    raise
+                logger.warning(f"Fal.ai request failed ({e!r}), retrying ({attempt + 1}/{max_attempts})")
+            await asyncio.sleep(min(0.5 * 2 ** attempt, 4.0) + random.random() * 0.2)
     
     async def generate(
         self,
@@ -37,15 +182,7 @@ class FalAIProvider(BaseProvider):
     ) -> Dict[str, Any]:
         """Generate an image using Fal.ai"""
         
-        # Map model names to Fal.ai endpoints
-        model_map = {
-            "flux-pro": "fal-ai/flux-pro",
-            "flux-dev": "fal-ai/flux/dev",
-            "flux-schnell": "fal-ai/flux/schnell"
-        }
-        
-        endpoint = model_map.get(model, "fal-ai/flux/schnell")
-        url = f"{self.base_url}/{endpoint}"
+        url = _MODEL_URLS.get(model, _DEFAULT_MODEL_URL)
         
         payload = {
             "prompt": prompt,
@@ -64,48 +201,48 @@ class FalAIProvider(BaseProvider):
             payload["seed"] = seed
         
         logger.info(f"Sending request to {url}")
-        logger.debug(f"Payload: {json.dumps(payload, indent=2)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Payload: %s", orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode())
         
         try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.post(url, json=payload, headers=self.headers)
-                
-                logger.info(f"Response status: {response.status_code}")
-                response_text = response.text
-                
-                if response.status_code != 200:
-                    logger.error(f"Fal.ai API Error: {response_text}")
-                    
-                    # Try to parse error message
-                    try:
-                        error_data = response.json()
-                        error_msg = error_data.get("detail", error_data.get("error", str(error_data)))
-                    except:
-                        error_msg = response_text[:500]
-                    
-                    raise Exception(f"Fal.ai API Error ({response.status_code}): {error_msg}")
+            response = await self._post_json(url, payload, timeout=120.0, max_attempts=3)
+            
+            logger.info(f"Response status: {response.status_code}")
+            response_bytes = response.content
+            
+            if response.status_code != 200:
+                logger.error(f"Fal.ai API Error: {response_bytes.decode('utf-8', errors='replace')}")
                 
-                # Parse the successful response
+                # Try to parse error message
                 try:
-                    result = response.json()
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse JSON response: {e}")
-                    logger.error(f"Response text: {response_text[:500]}")
-                    raise Exception(f"Invalid JSON response from Fal.ai: {str(e)}")
-                
-                # Handle the response format
-                images = []
-                if "images" in result:
-                    images = result["images"]
-                elif "image" in result:
-                    images = [result["image"]]
-                
-                return {
-                    "images": images,
-                    "seed": result.get("seed"),
-                    "has_nsfw": result.get("has_nsfw_concepts", [False])[0]
-                }
+                    error_data = orjson.loads(response_bytes)
+                    error_msg = error_data.get("detail", error_data.get("error", str(error_data)))
+                except:
+                    error_msg = _snippet(response_bytes)
                 
+                raise Exception(f"Fal.ai API Error ({response.status_code}): {error_msg}")
+            
+            # Parse the successful response
+            try:
+                result = orjson.loads(response_bytes)
+            except orjson.JSONDecodeError as e:
+                logger.error(f"Failed to parse JSON response: {e}")
+                logger.error(f"Response text: {_snippet(response_bytes)}")
+                raise Exception(f"Invalid JSON response from Fal.ai: {str(e)}")
+            
+            # Handle the response format
+            images = []
+            if "images" in result:
+                images = result["images"]
+            elif "image" in result:
+                images = [result["image"]]
+            
+            return {
+                "images": images,
+                "seed": result.get("seed"),
+                "has_nsfw": result.get("has_nsfw_concepts", [False])[0]
+            }
+            
         except httpx.RequestError as e:
             logger.error(f"Request error: {str(e)}")
             raise Exception(f"Request failed: {str(e)}")
@@ -125,15 +262,7 @@ class FalAIProvider(BaseProvider):
     ) -> Dict[str, Any]:
         """Generate image using WAN-25 Preview model (using Flux as fallback)"""
         
-        # Map aspect ratios to dimensions
-        aspect_map = {
-            "1:1": (1024, 1024),
-            "16:9": (1344, 768),
-            "9:16": (768, 1344),
-            "4:3": (1152, 896),
-            "3:4": (896, 1152)
-        }
-        width, height = aspect_map.get(aspect_ratio, (1024, 1024))
+        width, height = _ASPECT_MAP.get(aspect_ratio, (1024, 1024))
         
         # Add style to prompt if provided
         full_prompt = prompt
@@ -154,9 +283,9 @@ class FalAIProvider(BaseProvider):
     
     async def edit_qwen(
         self,
-        image: bytes,
+        image: Union[bytes, BinaryIO],
         instruction: str,
-        mask: Optional[bytes] = None,
+        mask: Optional[Union[bytes, BinaryIO]] = None,
         edit_type: str = "object",
         edit_strength: float = 0.8,
         coherence: float = 0.7,
@@ -168,12 +297,9 @@ class FalAIProvider(BaseProvider):
         
         url = f"{self.base_url}/fal-ai/qwen-image-edit-plus"
         
-        # Convert image to base64
-        image_b64 = base64.b64encode(image).decode('utf-8')
-        
-        # The API expects image_urls as an array
+        # The API expects image_urls as an array; base64 stays as bytes until the body is built
+        data_urls = {"image_urls": [("image/png", b64encode(_read_image(image)))]}
         payload = {
-            "image_urls": [f"data:image/png;base64,{image_b64}"],
             "prompt": instruction,
             "strength": edit_strength,
             "guidance_scale": coherence * 10,  # Map coherence to guidance scale
@@ -181,82 +307,54 @@ class FalAIProvider(BaseProvider):
         
         # Add mask if provided (also as array)
         if mask:
-            mask_b64 = base64.b64encode(mask).decode('utf-8')
-            payload["mask_urls"] = [f"data:image/png;base64,{mask_b64}"]
+            data_urls["mask_urls"] = [("image/png", b64encode(_read_image(mask)))]
         
         logger.info(f"Sending Qwen edit request to {url}")
         
         try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.post(url, json=payload, headers=self.headers)
-                
-                if response.status_code != 200:
-                    error_msg = response.text[:500]
-                    logger.error(f"Qwen API Error: {error_msg}")
-                    raise Exception(f"Qwen API Error ({response.status_code}): {error_msg}")
-                
-                result = response.json()
-                
-                # Format response
-                images = []
-                if "image" in result:
-                    images = [{"url": result["image"]}]
-                elif "images" in result:
-                    images = [{"url": img} if isinstance(img, str) else img for img in result["images"]]
-                
-                return {
-                    "images": images,
-                    "message": "Edit completed successfully"
-                }
-                
+            response = await self._post_json(url, payload, timeout=120.0, data_urls=data_urls)
+            
+            if response.status_code != 200:
+                error_msg = _snippet(response.content)
+                logger.error(f"Qwen API Error: {error_msg}")
+                raise Exception(f"Qwen API Error ({response.status_code}): {error_msg}")
+            
+            result = orjson.loads(response.content)
+            
+            # Format response
+            images = []
+            if "image" in result:
+                images = [{"url": result["image"]}]
+            elif "images" in result:
+                images = [{"url": img} if isinstance(img, str) else img for img in result["images"]]
+            
+            return {
+                "images": images,
+                "message": "Edit completed successfully"
+            }
+            
         except Exception as e:
             logger.error(f"Qwen edit error: {str(e)}")
             raise
     
-    async def generate_product_shoot(
-        self,
-        product_images: List[bytes],
-        category: str,
-        description: str,
-        scene_type: str = "studio",
-        background_style: str = "gradient",
-        lighting_setup: str = "soft",
-        props: Optional[List[str]] = None,
-        remove_background: bool = False,
-        preserve_shadows: bool = True,
-        color_palette: Optional[str] = None,
-        reflection_intensity: float = 0.0,
-        output_format: str = "png",
-        resolution: str = "1024x1024",
-        batch_size: int = 1,
-        **kwargs
-    ) -> Dict[str, Any]:
-        """Generate product photography using Easel AI Product Photoshoot"""
+    def _preprocess_product_image(self, raw: Union[bytes, BinaryIO]) -> bytes:
+        """Flatten, downscale and JPEG-compress a product image (CPU-bound; run in a thread)"""
         
-        url = f"{self.base_url}/easel-ai/product-photoshoot"
-        
-        # Convert first product image to base64
-        if not product_images:
-            raise Exception("At least one product image is required")
-        
-        # Compress and resize image if too large
-        from PIL import Image
-        import io
-        
-        original_size = len(product_images[0])
+        first_image = _read_image(raw)
+        original_size = len(first_image)
         logger.info(f"Original image size: {original_size} bytes ({original_size / 1024 / 1024:.2f} MB)")
         
         # Open the image
-        img = Image.open(io.BytesIO(product_images[0]))
+        img = Image.open(BytesIO(first_image))
         logger.info(f"Original dimensions: {img.size}")
         
         # Convert RGBA to RGB if necessary (for JPEG compatibility)
         if img.mode in ('RGBA', 'LA', 'P'):
-            # Create a white background
+            # Composite onto white in one C-level pass; getchannel avoids split()'s per-band copies
             background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
+            if img.mode != 'RGBA':
                 img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+            background.paste(img, mask=img.getchannel('A'))
             img = background
         elif img.mode not in ('RGB', 'L'):
             img = img.convert('RGB')
@@ -267,46 +365,63 @@ class FalAIProvider(BaseProvider):
             ratio = max_dimension / max(img.size)
             new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
             logger.info(f"Resizing image from {img.size} to {new_size}")
-            img = img.resize(new_size, Image.Resampling.LANCZOS)
+            img = img.resize(new_size, LANCZOS)
         
-        # Compress the image
-        output_buffer = io.BytesIO()
-        
-        # Try to get a reasonable file size (target: under 1MB)
-        quality = 95
+        # Compress the image (target: under 1MB) with at most two encodes
         max_size = 1024 * 1024  # 1MB
         
-        while quality >= 60:
-            output_buffer.seek(0)
-            output_buffer.truncate()
-            
-            # Save as JPEG for better compression
-            img.save(output_buffer, format='JPEG', quality=quality, optimize=True)
-            
-            if output_buffer.tell() <= max_size:
-                break
-            
-            quality -= 10
-            logger.info(f"Image too large ({output_buffer.tell()} bytes), reducing quality to {quality}")
+        # Save as JPEG for better compression
+        compressed_image = _encode_jpeg(img, 85)
         
-        # Get the compressed image bytes
-        output_buffer.seek(0)
-        compressed_image = output_buffer.read()
+        if len(compressed_image) > max_size:
+            # JPEG size scales roughly with pixel count, so shrink by the square root of the overshoot
+            scale = math.sqrt(max_size / len(compressed_image)) * 0.95
+            new_size = (int(img.size[0] * scale), int(img.size[1] * scale))
+            logger.info(f"Image too large ({len(compressed_image)} bytes), downscaling to {new_size}")
+            img.thumbnail(new_size, LANCZOS)
+            compressed_image = _encode_jpeg(img, 82)
         
         logger.info(f"Compressed image size: {len(compressed_image)} bytes ({len(compressed_image) / 1024:.2f} KB)")
         logger.info(f"Compression ratio: {original_size / len(compressed_image):.2f}x")
         
-        # Convert to base64
-        image_b64 = base64.b64encode(compressed_image).decode('utf-8')
-        logger.info(f"Base64 length: {len(image_b64)} characters")
+        return compressed_image
+    
+    async def generate_product_shoot(
+        self,
+        product_images: List[Union[bytes, BinaryIO]],
+        category: str,
+        description: str,
+        scene_type: str = "studio",
+        background_style: str = "gradient",
+        lighting_setup: str = "soft",
+        props: Optional[List[str]] = None,
+        remove_background: bool = False,
+        preserve_shadows: bool = True,
+        color_palette: Optional[str] = None,
+        reflection_intensity: float = 0.0,
+        output_format: str = "png",
+        resolution: str = "1024x1024",
+        batch_size: int = 1,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Generate product photography using Easel AI Product Photoshoot"""
+        
+        url = f"{self.base_url}/easel-ai/product-photoshoot"
         
-        # Simple, clear scene and placement descriptions that match API examples
-        # Scene MUST be at least 64 characters
-        scene = f"an image with a professional {scene_type} photography setting, featuring {background_style} background and {lighting_setup} lighting setup for product photography"
+        # Convert first product image to base64
+        if not product_images:
+            raise Exception("At least one product image is required")
+        
+        # Compress and resize image if too large, off the event loop
+        compressed_image = await asyncio.to_thread(self._preprocess_product_image, product_images[0])
+        
+        # Convert to base64; kept as bytes and spliced straight into the request body
+        image_b64 = b64encode(compressed_image)
+        logger.info("Base64 length: %d characters", len(image_b64))
         
-        # Ensure minimum length
-        if len(scene) < 64:
-            scene = f"an image with a professional photography studio setting, featuring elegant {background_style} background, sophisticated {lighting_setup} lighting, creating perfect product presentation environment"
+        # Simple, clear scene and placement descriptions that match API examples
+        # Scene MUST be at least 64 characters; the template alone is longer than that
+        scene = _build_scene(scene_type, background_style, lighting_setup)
         
         # Simple placement description similar to API example
         placement = f"the {category} product placed in the center of the image"
@@ -315,8 +430,8 @@ class FalAIProvider(BaseProvider):
             placement = f"the {category} product placed in the center with {', '.join(props[:2])}"
         
         # Use JPEG format for compressed image
+        data_urls = {"product_image": ("image/jpeg", image_b64)}
         payload = {
-            "product_image": f"data:image/jpeg;base64,{image_b64}",
             "scene": scene,
             "product_placement": placement
         }
@@ -325,95 +440,95 @@ class FalAIProvider(BaseProvider):
         if description and len(description.strip()) > 0:
             payload["product_description"] = description[:100]  # Limit length
         
-        # Log full details for debugging
-        logger.info(f"=== PRODUCT PHOTOSHOOT DEBUG ===")
-        logger.info(f"URL: {url}")
-        logger.info(f"Headers: {self.headers}")
-        logger.info(f"Scene ({len(scene)} chars): {scene}")
-        logger.info(f"Placement: {placement}")
-        logger.info(f"Product description: {payload.get('product_description', 'Not provided')}")
-        
-        # Log first 100 chars of base64 to verify format
-        logger.info(f"Image data prefix: data:image/jpeg;base64,{image_b64[:50]}...")
-        
-        # Create a sanitized payload for logging (without the full base64)
-        log_payload = payload.copy()
-        if "product_image" in log_payload:
-            log_payload["product_image"] = f"data:image/png;base64,[{len(image_b64)} chars]"
-        logger.info(f"Payload structure: {json.dumps(log_payload, indent=2)}")
+        # Log full details for debugging; skipped entirely unless DEBUG is on
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("=== PRODUCT PHOTOSHOOT DEBUG ===")
+            logger.debug("URL: %s", url)
+            logger.debug("Headers: %s", self.headers)
+            logger.debug("Scene (%d chars): %s", len(scene), scene)
+            logger.debug("Placement: %s", placement)
+            logger.debug("Product description: %s", payload.get('product_description', 'Not provided'))
+            
+            # Log the start of the base64 to verify format
+            logger.debug("Image data prefix: data:image/jpeg;base64,%s...", image_b64[:50].decode())
+            
+            # Sanitized payload for logging (without the full base64)
+            log_payload = {**payload, "product_image": f"data:image/jpeg;base64,[{len(image_b64)} chars]"}
+            logger.debug("Payload: %s", orjson.dumps(log_payload).decode())
         
         try:
             # Try with a longer timeout and log the exact request
-            async with httpx.AsyncClient(timeout=180.0) as client:
-                logger.info("Sending POST request...")
-                response = await client.post(url, json=payload, headers=self.headers)
-                
-                logger.info(f"Response status: {response.status_code}")
-                logger.info(f"Response headers: {dict(response.headers)}")
-                
-                # Log full response for debugging
-                response_text = response.text
-                logger.info(f"Response body: {response_text[:1000]}")  # First 1000 chars
+            logger.info("Sending POST request...")
+            response = await self._post_json(url, payload, timeout=180.0, data_urls=data_urls, max_attempts=3)
+            
+            logger.info("Response status: %d", response.status_code)
+            
+            response_bytes = response.content
+            if debug:
+                logger.debug("Response headers: %s", dict(response.headers))
+                logger.debug("Response body: %s", _snippet(response_bytes, 1000))  # First 1000 chars
+            
+            if response.status_code != 200:
+                logger.error(f"=== ERROR DETAILS ===")
+                logger.error(f"Status: {response.status_code}")
+                logger.error(f"Response: {response_bytes.decode('utf-8', errors='replace')}")
                 
-                if response.status_code != 200:
-                    logger.error(f"=== ERROR DETAILS ===")
-                    logger.error(f"Status: {response.status_code}")
-                    logger.error(f"Response: {response_text}")
-                    
-                    # Check if it's a validation error
-                    try:
-                        error_data = response.json()
-                        logger.error(f"Error JSON: {json.dumps(error_data, indent=2)}")
-                        
-                        # Check for specific validation errors
-                        if "detail" in error_data:
-                            if isinstance(error_data["detail"], list):
-                                # FastAPI validation error format
-                                for error in error_data["detail"]:
-                                    logger.error(f"Validation error: {error}")
-                            else:
-                                logger.error(f"Error detail: {error_data['detail']}")
-                        
-                        error_msg = error_data.get("detail", str(error_data))
-                    except:
-                        error_msg = response_text[:500]
+                # Check if it's a validation error
+                try:
+                    error_data = orjson.loads(response_bytes)
+                    logger.error(f"Error JSON: {orjson.dumps(error_data, option=orjson.OPT_INDENT_2).decode()}")
                     
-                    # If it's a 500 error, it might be an issue with the image format
-                    if response.status_code == 500:
-                        logger.error("500 error - possible causes:")
-                        logger.error("1. Image format not supported (try PNG/JPEG)")
-                        logger.error("2. Image too large (try compressing)")
-                        logger.error("3. API service issue")
-                        logger.error("4. Invalid base64 encoding")
+                    # Check for specific validation errors
+                    if "detail" in error_data:
+                        if isinstance(error_data["detail"], list):
+                            # FastAPI validation error format
+                            for error in error_data["detail"]:
+                                logger.error(f"Validation error: {error}")
+                        else:
+                            logger.error(f"Error detail: {error_data['detail']}")
                     
-                    raise Exception(f"Product Photoshoot API Error ({response.status_code}): {error_msg}")
-                
-                result = response.json()
-                logger.info(f"Success! API Response: {json.dumps(result, indent=2)}")
+                    error_msg = error_data.get("detail", str(error_data))
+                except:
+                    error_msg = _snippet(response_bytes)
                 
-                # Format response - the API returns an image object with URL
-                images = []
-                if "image" in result:
-                    if isinstance(result["image"], dict) and "url" in result["image"]:
-                        images = [{"url": result["image"]["url"]}]
-                    elif isinstance(result["image"], str):
-                        images = [{"url": result["image"]}]
-                elif "images" in result:
-                    for img in result["images"]:
-                        if isinstance(img, dict) and "url" in img:
-                            images.append({"url": img["url"]})
-                        elif isinstance(img, str):
-                            images.append({"url": img})
-                
-                if not images:
-                    logger.warning("No images found in response, returning raw result")
-                    images = [{"url": "error: no image URL found"}]
-                
-                return {
-                    "images": images,
-                    "message": f"Generated product photo successfully"
-                }
+                # If it's a 500 error, it might be an issue with the image format
+                if response.status_code == 500:
+                    logger.error("500 error - possible causes:")
+                    logger.error("1. Image format not supported (try PNG/JPEG)")
+                    logger.error("2. Image too large (try compressing)")
+                    logger.error("3. API service issue")
+                    logger.error("4. Invalid base64 encoding")
                 
+                raise Exception(f"Product Photoshoot API Error ({response.status_code}): {error_msg}")
+            
+            result = orjson.loads(response_bytes)
+            if debug:
+                logger.debug("Success! API Response: %s", orjson.dumps(result).decode())
+            
+            # Format response - the API returns an image object with URL
+            images = []
+            if "image" in result:
+                if isinstance(result["image"], dict) and "url" in result["image"]:
+                    images = [{"url": result["image"]["url"]}]
+                elif isinstance(result["image"], str):
+                    images = [{"url": result["image"]}]
+            elif "images" in result:
+                for img in result["images"]:
+                    if isinstance(img, dict) and "url" in img:
+                        images.append({"url": img["url"]})
+                    elif isinstance(img, str):
+                        images.append({"url": img})
+            
+            if not images:
+                logger.warning("No images found in response, returning raw result")
+                images = [{"url": "error: no image URL found"}]
+            
+            return {
+                "images": images,
+                "message": f"Generated product photo successfully"
+            }
+            
         except httpx.TimeoutException:
             logger.error("Request timed out after 180 seconds")
             raise Exception("Product photoshoot request timed out. The image might be too large or the service is slow.")
@@ -424,128 +539,115 @@ class FalAIProvider(BaseProvider):
     
     async def get_models(self) -> list:
         """Get available models"""
-        return [
-            {"id": "flux-schnell", "name": "Flux Schnell", "type": "text-to-image"},
-            {"id": "flux-dev", "name": "Flux Dev", "type": "text-to-image"},
-            {"id": "flux-pro", "name": "Flux Pro", "type": "text-to-image"},
-            {"id": "qwen-edit", "name": "Qwen Image Edit Plus", "type": "image-edit"},
-            {"id": "product-photoshoot", "name": "Product Photoshoot", "type": "product"}
-        ]
-        # Add this method to backend/providers/fal_ai.py in the FalAIProvider class
-
-async def generate_wan25_i2v(
-    self,
-    image_data: str,
-    prompt: str,
-    duration: int = 5,
-    resolution: str = "720p",
-    fps: int = 30,
-    generate_audio: bool = True,
-    guidance_scale: float = 7.0,
-    motion_strength: float = 1.0,
-    camera_movement: str = "auto",
-    seed: Optional[int] = None
-) -> Dict[str, Any]:
-    """Generate video from image using WAN 2.5 Preview Image-to-Video API"""
+        return _MODELS
     
-    # Use the queue endpoint for longer processing
-    url = "https://queue.fal.run/fal-ai/wan-25-preview/image-to-video"
+    async def generate_wan25_i2v(
+        self,
+        image_data: str,
+        prompt: str,
+        duration: int = 5,
+        resolution: str = "720p",
+        fps: int = 30,
+        generate_audio: bool = True,
+        guidance_scale: float = 7.0,
+        motion_strength: float = 1.0,
+        camera_movement: str = "auto",
+        seed: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Generate video from image using WAN 2.5 Preview Image-to-Video API"""
     
-    # Convert base64 image to data URL
-    image_url = f"data:image/jpeg;base64,{image_data}"
+        # Use the queue endpoint for longer processing
+        url = "https://queue.fal.run/fal-ai/wan-25-preview/image-to-video"
     
-    # Build the payload according to WAN 2.5 API docs
-    payload = {
-        "image_url": image_url,
-        "prompt": prompt,
-        "num_frames": duration * fps,  # Calculate total frames
-        "fps": fps,
-        "enable_audio": generate_audio,
-        "cfg_scale": guidance_scale,
-        "motion_bucket_id": int(motion_strength * 127),  # Convert to motion bucket scale (0-255)
-    }
+        # Already base64; spliced into the request body as a data URL without another copy
+        data_urls = {"image_url": ("image/jpeg", image_data.encode())}
+    
+        # Build the payload according to WAN 2.5 API docs
+        payload = {
+            "prompt": prompt,
+            "num_frames": duration * fps,  # Calculate total frames
+            "fps": fps,
+            "enable_audio": generate_audio,
+            "cfg_scale": guidance_scale,
+            "motion_bucket_id": int(motion_strength * 127),  # Convert to motion bucket scale (0-255)
+        }
     
-    # Add resolution mapping
-    if resolution == "1080p":
-        payload["width"] = 1920
-        payload["height"] = 1080
-    else:  # 720p default
-        payload["width"] = 1280
-        payload["height"] = 720
+        # Add resolution mapping
+        if resolution == "1080p":
+            payload["width"] = 1920
+            payload["height"] = 1080
+        else:  # 720p default
+            payload["width"] = 1280
+            payload["height"] = 720
     
-    # Add seed if provided
-    if seed is not None:
-        payload["seed"] = seed
+        # Add seed if provided
+        if seed is not None:
+            payload["seed"] = seed
     
-    # Add camera movement hints to prompt if specified
-    camera_prompts = {
-        "pan": "camera panning slowly",
-        "zoom": "camera zooming in",
-        "tilt": "camera tilting",
-        "orbit": "camera orbiting around the subject",
-        "tracking": "camera tracking the subject"
-    }
+        # Add camera movement hints to prompt if specified
+        camera_prompts = {
+            "pan": "camera panning slowly",
+            "zoom": "camera zooming in",
+            "tilt": "camera tilting",
+            "orbit": "camera orbiting around the subject",
+            "tracking": "camera tracking the subject"
+        }
     
-    if camera_movement != "auto" and camera_movement != "static":
-        if camera_movement in camera_prompts:
-            payload["prompt"] = f"{prompt}, {camera_prompts[camera_movement]}"
+        if camera_movement != "auto" and camera_movement != "static":
+            if camera_movement in camera_prompts:
+                payload["prompt"] = f"{prompt}, {camera_prompts[camera_movement]}"
     
-    logger.info(f"Sending WAN 2.5 I2V request to {url}")
-    logger.debug(f"Payload (excluding image): {dict(payload, image_url='[base64_data]')}")
+        logger.info(f"Sending WAN 2.5 I2V request to {url}")
+        logger.debug(f"Payload (excluding image): {payload}")
     
-    try:
-        async with httpx.AsyncClient(timeout=180.0) as client:
+        try:
             # Submit the request
-            response = await client.post(
-                f"{url}/submit",
-                json=payload,
-                headers=self.headers
-            )
-            
+            response = await self._post_json(f"{url}/submit", payload, timeout=180.0, data_urls=data_urls)
+        
             if response.status_code != 200:
-                error_msg = response.text[:500]
+                error_msg = _snippet(response.content)
                 logger.error(f"WAN 2.5 I2V Submit Error: {error_msg}")
                 raise Exception(f"WAN 2.5 I2V API Error ({response.status_code}): {error_msg}")
-            
-            submit_result = response.json()
+        
+            submit_result = orjson.loads(response.content)
             request_id = submit_result.get("request_id")
-            
+        
             if not request_id:
                 raise Exception("No request ID received from API")
-            
+        
             logger.info(f"WAN 2.5 I2V request submitted, ID: {request_id}")
-            
+        
             # Poll for result
             max_attempts = 60  # 3 minutes max wait (3 seconds per attempt)
             for attempt in range(max_attempts):
                 await asyncio.sleep(3)  # Wait 3 seconds between polls
-                
-                status_response = await client.get(
+            
+                status_response = await self.client.get(
                     f"{url}/status/{request_id}",
                     headers=self.headers
                 )
-                
+            
                 if status_response.status_code != 200:
-                    logger.warning(f"Status check failed: {status_response.text[:200]}")
+                    logger.warning(f"Status check failed: {_snippet(status_response.content, 200)}")
                     continue
-                
-                status_data = status_response.json()
+            
+                status_data = orjson.loads(status_response.content)
                 status = status_data.get("status")
-                
+            
                 logger.debug(f"WAN 2.5 I2V status: {status} (attempt {attempt + 1}/{max_attempts})")
-                
+            
                 if status == "completed":
                     # Get the result
-                    result_response = await client.get(
+                    result_response = await self.client.get(
                         f"{url}/result/{request_id}",
                         headers=self.headers
                     )
-                    
+                
                     if result_response.status_code != 200:
-                        raise Exception(f"Failed to get result: {result_response.text[:500]}")
-                    
-                    result_data = result_response.json()
-                    
+                        raise Exception(f"Failed to get result: {_snippet(result_response.content)}")
+                
+                    result_data = orjson.loads(result_response.content)
+                
                     # Extract video URL and metadata
                     video_info = {}
                     if "video" in result_data:
@@ -560,7 +662,7 @@ async def generate_wan25_i2v(
                         }
                     else:
                         raise Exception("No video URL in response")
-                    
+                
                     # Return formatted response
                     return {
                         "video": video_info,
@@ -568,31 +670,17 @@ async def generate_wan25_i2v(
                         "actual_prompt": result_data.get("actual_prompt", prompt),
                         "message": "Video generated successfully"
                     }
-                
+            
                 elif status == "failed" or status == "error":
                     error = status_data.get("error", "Unknown error")
                     raise Exception(f"WAN 2.5 I2V generation failed: {error}")
-            
+        
             # Timeout after max attempts
             raise Exception("WAN 2.5 I2V generation timed out after 3 minutes")
-            
-    except asyncio.TimeoutError:
-        logger.error("WAN 2.5 I2V request timeout")
-        raise Exception("Request timeout - video generation is taking too long")
-    except Exception as e:
-        logger.error(f"WAN 2.5 I2V error: {str(e)}")
-        raise
-
-# Also add this to the get_models() method if it exists:
-def get_models(self) -> List[Dict[str, Any]]:
-    """Return list of available models"""
-    return [
-        # ... existing models ...
-        {
-            "id": "wan-25-i2v",
-            "name": "WAN 2.5 Image-to-Video",
-            "description": "Transform images into dynamic videos with native audio generation",
-            "type": "image-to-video",
-            "features": ["audio_generation", "camera_control", "motion_control"]
-        }
-    ]
\ No newline at end of file
+        
+        except asyncio.TimeoutError:
+            logger.error("WAN 2.5 I2V request timeout")
+            raise Exception("Request timeout - video generation is taking too long")
+        except Exception as e:
+            logger.error(f"WAN 2.5 I2V error: {str(e)}")
+            raise
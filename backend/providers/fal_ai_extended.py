@@ -1,14 +1,122 @@
 # backend/providers/fal_ai_extended.py
 
 import os
-import json
-import base64
+import sys
+import orjson
+import asyncio
+import hashlib
+import random
+import statistics
+import time
+import aiofiles
 import httpx
 import logging
 from typing import Dict, Any, List, Optional, Union
+from collections import OrderedDict, deque
+from types import MappingProxyType
 from dataclasses import dataclass
+from pathlib import Path
 from enum import Enum
 
+from backend.utils.b64 import B64_BACKEND, b64encode
+
+# Multiple of 3 so each chunk base64-encodes without padding and the pieces concatenate
+ENCODE_CHUNK_SIZE = 3 * 65536
+# Inline bytes above this size are encoded in a worker thread
+ENCODE_OFFLOAD_SIZE = 1024 * 1024
+
+# Images above this size are uploaded to Fal storage and referenced by URL instead of inlined
+UPLOAD_THRESHOLD = 100_000
+UPLOAD_INITIATE_URL = "https://rest.alpha.fal.ai/storage/upload/initiate"
+UPLOAD_CACHE_SIZE = 256
+
+CONNECTION_CHECK_TTL = 15.0
+
+DATA_URL_PREFIX = b'"data:image/png;base64,'
+
+def _data_url(raw: bytes) -> orjson.Fragment:
+    """PNG data URL as a pre-serialized JSON string; base64 needs no escaping, so orjson copies it verbatim"""
+    return orjson.Fragment(b"".join((DATA_URL_PREFIX, b64encode(raw), b'"')))
+
+def _envelope(payload: Dict[str, Any], style: str) -> bytes:
+    """Serialize the payload with orjson, either top-level or under an `input` key"""
+    return orjson.dumps({"input": payload} if style == "input" else payload)
+
+POLL_BASE_DELAY = 0.5
+POLL_MAX_DELAY = 4.0
+POLL_TIMEOUT = 120.0
+
+_ASPECT_RATIOS = MappingProxyType({
+    "1:1": (1024, 1024),
+    "16:9": (1920, 1080),
+    "9:16": (1080, 1920),
+    "4:3": (1024, 768),
+    "3:2": (1152, 768)
+})
+
+_EDIT_PARAMS = MappingProxyType({
+    "object_removal": {
+        "inpaint_mode": "remove",
+        "edge_blend": 0.2
+    },
+    "object_replacement": {
+        "inpaint_mode": "replace",
+        "context_aware": True
+    },
+    "background_change": {
+        "segment_mode": "background",
+        "blend_edges": True
+    },
+    "style_transfer": {
+        "style_preservation": 0.3,
+        "content_preservation": 0.7
+    },
+    "color_adjustment": {
+        "color_mode": "adaptive",
+        "preserve_luminance": True
+    }
+})
+
+_FORMAT_DIMENSIONS = MappingProxyType({
+    "square": (1024, 1024),
+    "portrait": (768, 1024),
+    "landscape": (1024, 768),
+    "banner": (1920, 1080),
+    "story": (1080, 1920)
+})
+
+_RES_SCALE = MappingProxyType({"1920": 1.875, "3840": 3.75})
+
+_SCENE_SETTINGS = MappingProxyType({
+    "studio": {
+        "background_blur": 0,
+        "shadow_intensity": 0.5
+    },
+    "lifestyle": {
+        "context_blend": 0.7,
+        "natural_lighting": True
+    },
+    "outdoor": {
+        "environment": "natural",
+        "time_of_day": "golden_hour"
+    },
+    "minimalist": {
+        "simplicity": 1.0,
+        "negative_space": 0.6
+    },
+    "luxury": {
+        "premium_finish": True,
+        "glamour_lighting": True
+    }
+})
+
+def _retry_after(response: httpx.Response) -> float:
+    """Seconds the server asked us to wait before polling again, or 0"""
+    try:
+        return float(response.headers.get("retry-after", 0))
+    except ValueError:
+        return 0.0
+
 class FalModel(Enum):
     """Supported Fal.ai models with their endpoints"""
     # Existing models
@@ -21,7 +129,10 @@ class FalModel(Enum):
     QWEN_IMAGE_EDIT = "fal-ai/qwen-image-edit-plus"
     PRODUCT_PHOTOSHOOT = "easel-ai/product-photoshoot"
 
-@dataclass
+# dataclass(slots=...) needs Python 3.10+
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(frozen=True, **_SLOTS)
 class ImageInput:
     """Represents an image input for models"""
     data: Union[str, bytes]  # Base64 or bytes
@@ -34,24 +145,95 @@ class ImageInput:
             return {"url": self.url}
         elif self.path:
             with open(self.path, "rb") as f:
-                data = base64.b64encode(f.read()).decode('utf-8')
-                return {"data": f"data:image/png;base64,{data}"}
+                return {"data": _data_url(f.read())}
         elif isinstance(self.data, bytes):
-            data = base64.b64encode(self.data).decode('utf-8')
-            return {"data": f"data:image/png;base64,{data}"}
+            return {"data": _data_url(self.data)}
         else:
             return {"data": self.data}
+    
+    async def to_fal_format_async(self) -> Dict[str, Any]:
+        """Like to_fal_format, but streams files and keeps large encodes off the event loop"""
+        if self.url:
+            return {"url": self.url}
+        elif self.path:
+            parts = [DATA_URL_PREFIX]
+            async with aiofiles.open(self.path, "rb") as f:
+                while chunk := await f.read(ENCODE_CHUNK_SIZE):
+                    parts.append(b64encode(chunk))
+            parts.append(b'"')
+            return {"data": orjson.Fragment(b"".join(parts))}
+        elif isinstance(self.data, bytes) and len(self.data) > ENCODE_OFFLOAD_SIZE:
+            return {"data": await asyncio.to_thread(_data_url, self.data)}
+        return self.to_fal_format()
+
+class Throttle:
+    """AIMD concurrency gate plus a 60 s sliding requests-per-minute window for queue submissions"""
+    
+    def __init__(
+        self,
+        initial: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        target_latency: float = 2.0,
+        rpm_limit: int = 120
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.rpm_limit = rpm_limit
+        self._active = 0
+        self._cond = asyncio.Condition()
+        self._sent: deque = deque()
+        self._latencies: deque = deque(maxlen=20)
+    
+    async def acquire(self):
+        """Wait for a concurrency slot and room in the RPM window"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._active < int(self.limit))
+            self._active += 1
+        while True:
+            now = time.monotonic()
+            while self._sent and now - self._sent[0] >= 60:
+                self._sent.popleft()
+            if len(self._sent) < self.rpm_limit:
+                self._sent.append(now)
+                return
+            await asyncio.sleep(60 - (now - self._sent[0]))
+    
+    async def release(self, latency: float, throttled: bool = False):
+        """Free the slot; grow the limit additively while fast, halve it when slow or throttled"""
+        if not throttled:
+            self._latencies.append(latency)
+        if throttled or statistics.median(self._latencies) > self.target_latency:
+            self.limit = max(self.min_limit, self.limit * 0.5)
+        else:
+            self.limit = min(self.max_limit, self.limit + 0.5)
+        async with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
 
 class FalAIProvider:
     """Extended Fal.ai provider with support for new models"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, client: Optional[httpx.AsyncClient] = None):
         self.api_key = api_key
         self.base_url = "https://queue.fal.run"
         self.headers = {
             "Authorization": f"Key {api_key}",
             "Content-Type": "application/json"
         }
+        # A client passed in is shared and closed by its owner; otherwise one is created on first use
+        self._client = client
+        self._owns_client = client is None
+        self._client_lock = asyncio.Lock()
+        self.throttle = Throttle()
+        # model -> "input" or "top", the request envelope that model accepted
+        self._envelope_style: Dict[str, str] = {}
+        self._last_check: Optional[float] = None
+        self._last_ok = False
+        # sha256 of uploaded bytes -> Fal storage URL, so repeated references upload once
+        self._uploads: "OrderedDict[str, str]" = OrderedDict()
         self.logger = logging.getLogger("fal_ai_provider")
         if not self.logger.handlers:
             handler = logging.StreamHandler()
@@ -59,6 +241,75 @@ class FalAIProvider:
             handler.setFormatter(formatter)
             self.logger.addHandler(handler)
             self.logger.setLevel(logging.INFO)
+        self.logger.debug("base64 backend: %s", B64_BACKEND)
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Pooled HTTP/2 client, created lazily so it binds to the running event loop"""
+        if self._client is None:
+            async with self._client_lock:
+                if self._client is None:
+                    # No default auth headers: Fal calls pass self.headers per request, so the
+                    # presigned storage PUT never carries the API key to a third-party host
+                    self._client = httpx.AsyncClient(
+                        http2=True,
+                        limits=httpx.Limits(max_connections=64, max_keepalive_connections=64)
+                    )
+        return self._client
+    
+    async def aclose(self):
+        """Close the pooled HTTP client if this provider created it"""
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _upload_blob(self, data: bytes, mime: str = "image/png") -> str:
+        """Upload bytes to Fal storage and return the file URL, reusing earlier uploads"""
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self._uploads:
+            self._uploads.move_to_end(digest)
+            return self._uploads[digest]
+        
+        client = await self._get_client()
+        initiate = await client.post(
+            UPLOAD_INITIATE_URL,
+            headers=self.headers,
+            json={"content_type": mime, "file_name": f"{digest[:16]}.png"},
+            timeout=10.0
+        )
+        initiate.raise_for_status()
+        upload = orjson.loads(initiate.content)
+        put = await client.put(upload["upload_url"], content=data, headers={"Content-Type": mime}, timeout=60.0)
+        put.raise_for_status()
+        
+        self._uploads[digest] = upload["file_url"]
+        if len(self._uploads) > UPLOAD_CACHE_SIZE:
+            self._uploads.popitem(last=False)
+        return upload["file_url"]
+    
+    async def _image_refs(self, images: List[ImageInput]) -> List[Dict[str, Any]]:
+        """Encode a request's images concurrently, encoding repeated images (e.g. a shared reference) once"""
+        unique = list(dict.fromkeys(images))
+        refs = dict(zip(unique, await asyncio.gather(*(self._image_ref(img) for img in unique))))
+        return [refs[img] for img in images]
+    
+    async def _image_ref(self, image: ImageInput) -> Dict[str, Any]:
+        """Reference large images by uploaded URL; inline small ones as data URLs"""
+        data = None
+        if image.url:
+            pass
+        elif image.path:
+            if os.path.getsize(image.path) > UPLOAD_THRESHOLD:
+                async with aiofiles.open(image.path, "rb") as f:
+                    data = await f.read()
+        elif isinstance(image.data, bytes) and len(image.data) > UPLOAD_THRESHOLD:
+            data = image.data
+        
+        if data is not None:
+            try:
+                return {"url": await self._upload_blob(data)}
+            except Exception as e:
+                self.logger.warning(f"Storage upload failed, sending image inline: {e}")
+        return await image.to_fal_format_async()
     
     async def generate_wan25_preview(
         self,
@@ -80,13 +331,13 @@ class FalAIProvider:
         # Parse output size
         width, height = map(int, output_size.split('x'))
         
+        # Encode the main and reference images concurrently
+        main_ref, *reference_refs = await self._image_refs([image, *(reference_images or ())])
+        
         # Prepare request payload
         payload = {
             "prompt": prompt,
-            # add alternate prompt fields for compatibility
-            "text_prompt": prompt,
-            "caption": prompt,
-            "image": image.to_fal_format(),
+            "image": main_ref,
             "image_influence": image_influence,
             "style_strength": style_strength,
             "width": width,
@@ -99,25 +350,15 @@ class FalAIProvider:
         
         # Add reference images if provided
         if reference_images:
-            payload["reference_images"] = [
-                img.to_fal_format() for img in reference_images
-            ]
+            payload["reference_images"] = reference_refs
         
         # Add seed if specified
         if seed and seed != -1:
             payload["seed"] = seed
         
         # Handle aspect ratio
-        if aspect_ratio != "original":
-            aspect_ratios = {
-                "1:1": (1024, 1024),
-                "16:9": (1920, 1080),
-                "9:16": (1080, 1920),
-                "4:3": (1024, 768),
-                "3:2": (1152, 768)
-            }
-            if aspect_ratio in aspect_ratios:
-                payload["width"], payload["height"] = aspect_ratios[aspect_ratio]
+        if aspect_ratio in _ASPECT_RATIOS:
+            payload["width"], payload["height"] = _ASPECT_RATIOS[aspect_ratio]
         
         # lightweight debug (avoid logging images)
         try:
@@ -141,10 +382,8 @@ class FalAIProvider:
         Edit images with Qwen Image Edit Plus model
         """
         payload = {
-            "image": image.to_fal_format(),
+            "image": await self._image_ref(image),
             "prompt": instruction,
-            "text_prompt": instruction,
-            "instruction": instruction,
             "edit_mode": edit_type,
             "strength": edit_strength,
             "coherence_factor": coherence,
@@ -154,34 +393,10 @@ class FalAIProvider:
         
         # Add mask if provided
         if mask:
-            payload["mask"] = mask.to_fal_format()
+            payload["mask"] = await self._image_ref(mask)
         
         # Edit type specific parameters
-        edit_params = {
-            "object_removal": {
-                "inpaint_mode": "remove",
-                "edge_blend": 0.2
-            },
-            "object_replacement": {
-                "inpaint_mode": "replace",
-                "context_aware": True
-            },
-            "background_change": {
-                "segment_mode": "background",
-                "blend_edges": True
-            },
-            "style_transfer": {
-                "style_preservation": 0.3,
-                "content_preservation": 0.7
-            },
-            "color_adjustment": {
-                "color_mode": "adaptive",
-                "preserve_luminance": True
-            }
-        }
-        
-        if edit_type in edit_params:
-            payload.update(edit_params[edit_type])
+        payload.update(_EDIT_PARAMS.get(edit_type, {}))
         
         return await self._submit_request(FalModel.QWEN_IMAGE_EDIT.value, payload)
     
@@ -207,31 +422,20 @@ class FalAIProvider:
         """
         Generate product photography with the Product Photoshoot model
         """
-        # Format mapping
-        format_dimensions = {
-            "square": (1024, 1024),
-            "portrait": (768, 1024),
-            "landscape": (1024, 768),
-            "banner": (1920, 1080),
-            "story": (1080, 1920)
-        }
-        
-        width, height = format_dimensions.get(output_format, (1024, 1024))
+        width, height = _FORMAT_DIMENSIONS.get(output_format, (1024, 1024))
         
         # Scale based on resolution
-        if resolution == "1920":
-            scale = 1.875
-        elif resolution == "3840":
-            scale = 3.75
-        else:
-            scale = 1.0
+        scale = _RES_SCALE.get(resolution, 1.0)
         
         width = int(width * scale)
         height = int(height * scale)
         
+        # Encode product images concurrently; large ones are encoded in worker threads
+        encoded_images = await self._image_refs(product_images)
+        
         # Prepare payload
         payload = {
-            "product_images": [img.to_fal_format() for img in product_images],
+            "product_images": list(encoded_images),
             "category": product_category,
             "description": product_description,
             "scene_type": scene_type,
@@ -267,136 +471,145 @@ class FalAIProvider:
             payload["color_palette"] = color_palette
         
         # Scene-specific settings
-        scene_settings = {
-            "studio": {
-                "background_blur": 0,
-                "shadow_intensity": 0.5
-            },
-            "lifestyle": {
-                "context_blend": 0.7,
-                "natural_lighting": True
-            },
-            "outdoor": {
-                "environment": "natural",
-                "time_of_day": "golden_hour"
-            },
-            "minimalist": {
-                "simplicity": 1.0,
-                "negative_space": 0.6
-            },
-            "luxury": {
-                "premium_finish": True,
-                "glamour_lighting": True
-            }
-        }
-        
-        if scene_type in scene_settings:
-            payload["scene_settings"] = scene_settings[scene_type]
+        if scene_type in _SCENE_SETTINGS:
+            payload["scene_settings"] = _SCENE_SETTINGS[scene_type]
         
         return await self._submit_request(FalModel.PRODUCT_PHOTOSHOOT.value, payload)
     
+    async def _post_submit(self, client: httpx.AsyncClient, url: str, content: bytes, max_attempts: int = 3) -> httpx.Response:
+        """POST a queue submission through the throttle, backing off on 429"""
+        for attempt in range(max_attempts):
+            await self.throttle.acquire()
+            started = time.monotonic()
+            throttled = False
+            try:
+                response = await client.post(url, headers=self.headers, content=content, timeout=30.0)
+                throttled = response.status_code == 429 or response.headers.get("x-ratelimit-remaining") == "0"
+            finally:
+                await self.throttle.release(time.monotonic() - started, throttled)
+            if response.status_code != 429 or attempt == max_attempts - 1:
+                return response
+            wait = max(_retry_after(response), POLL_BASE_DELAY * 2 ** attempt)
+            self.logger.warning(f"Rate limited by Fal.ai, retrying in {wait:.1f}s (limit now {int(self.throttle.limit)})")
+            await asyncio.sleep(wait)
+    
     async def _submit_request(self, model: str, payload: Dict[str, Any], wrap_input: bool = False) -> Dict[str, Any]:
         """Submit request to Fal.ai API and handle response.
-        Some models expect the body under an `input` key (client libraries do this). Use wrap_input=True to send {"input": payload}.
+        Some models expect the body under an `input` key (client libraries do this). Use wrap_input=True to try {"input": payload} first.
         """
         self.logger.info(f"Submitting to {model}")
-        async with httpx.AsyncClient() as client:
-            # Submit to queue
-            try:
-                body = {"input": payload} if wrap_input else payload
-                # send both top-level and input envelope for compatibility
-                if wrap_input:
-                    body = {**payload, "input": payload}
-                submit_response = await client.post(
-                    f"{self.base_url}/{model}",
-                    headers=self.headers,
-                    json=body,
-                    timeout=30.0
-                )
-                submit_response.raise_for_status()
-            except Exception as e:
-                self.logger.error(f"Submit failed: {e}")
-                try:
-                    self.logger.error(f"Response: {submit_response.text[:500]}")
-                except Exception:
-                    pass
-                raise
-            
-            # Get request ID
-            submit_data = submit_response.json()
+        client = await self._get_client()
+        # Submit to queue
+        try:
+            # Send exactly one copy of the payload; with wrap_input, fall back to the other
+            # envelope once on a schema error and remember which one the model accepted
+            style = self._envelope_style.get(model, "input" if wrap_input else "top")
+            submit_response = await self._post_submit(client, f"{self.base_url}/{model}", _envelope(payload, style))
+            if wrap_input and model not in self._envelope_style and submit_response.status_code in (400, 422):
+                style = "top" if style == "input" else "input"
+                submit_response = await self._post_submit(client, f"{self.base_url}/{model}", _envelope(payload, style))
+            submit_response.raise_for_status()
+            self._envelope_style[model] = style
+        except Exception as e:
+            self.logger.error(f"Submit failed: {e}")
             try:
-                self.logger.info(f"Submit response keys: {list(submit_data.keys())}")
+                self.logger.error(f"Response: {submit_response.text[:500]}")
             except Exception:
                 pass
-            request_id = submit_data.get("request_id")
+            raise
+        
+        # Get request ID
+        submit_data = orjson.loads(submit_response.content)
+        try:
+            self.logger.info(f"Submit response keys: {list(submit_data.keys())}")
+        except Exception:
+            pass
+        request_id = submit_data.get("request_id")
+        
+        if not request_id:
+            return submit_data  # Synchronous response
+        
+        # Poll for results
+        status_url = f"{self.base_url}/{model}/requests/{request_id}/status"
+        result_url = f"{self.base_url}/{model}/requests/{request_id}"
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + POLL_TIMEOUT
+        delay = POLL_BASE_DELAY
+        while loop.time() < deadline:
+            await asyncio.sleep(delay)
             
-            if not request_id:
-                return submit_data  # Synchronous response
+            status_response = await client.get(
+                status_url,
+                headers=self.headers,
+                timeout=10.0
+            )
             
-            # Poll for results
-            status_url = f"{self.base_url}/{model}/requests/{request_id}/status"
-            result_url = f"{self.base_url}/{model}/requests/{request_id}"
+            # Back off exponentially with jitter, but never poll sooner than the server asks
+            delay = min(POLL_MAX_DELAY, delay * 2) + random.uniform(0, 0.25)
+            delay = max(delay, _retry_after(status_response))
             
-            max_attempts = 60  # 2 minutes with 2-second intervals
-            for attempt in range(max_attempts):
-                await asyncio.sleep(2)
+            if status_response.status_code == 200:
+                status_data = orjson.loads(status_response.content)
                 
-                status_response = await client.get(
-                    status_url,
-                    headers=self.headers,
-                    timeout=10.0
-                )
+                if status_data.get("status") == "COMPLETED":
+                    # Get the actual result
+                    result_response = await client.get(
+                        result_url,
+                        headers=self.headers,
+                        timeout=10.0
+                    )
+                    return orjson.loads(result_response.content)
                 
-                if status_response.status_code == 200:
-                    status_data = status_response.json()
-                    
-                    if status_data.get("status") == "COMPLETED":
-                        # Get the actual result
-                        result_response = await client.get(
-                            result_url,
-                            headers=self.headers,
-                            timeout=10.0
-                        )
-                        return result_response.json()
-                    
-                    elif status_data.get("status") == "FAILED":
-                        err = status_data.get('error')
-                        self.logger.error(f"Job failed: {err}")
-                        raise Exception(f"Generation failed: {err}")
-            
-            raise TimeoutError("Request timed out after 2 minutes")
+                elif status_data.get("status") == "FAILED":
+                    err = status_data.get('error')
+                    self.logger.error(f"Job failed: {err}")
+                    raise Exception(f"Generation failed: {err}")
+        
+        raise TimeoutError("Request timed out after 2 minutes")
     
     async def test_connection(self) -> bool:
-        """Test API connection"""
+        """Test API connection, reusing the last result for CONNECTION_CHECK_TTL seconds"""
+        now = time.monotonic()
+        if self._last_check is not None and now - self._last_check < CONNECTION_CHECK_TTL:
+            return self._last_ok
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    "https://queue.fal.run/health",
-                    headers={"Authorization": f"Key {self.api_key}"},
-                    timeout=5.0
-                )
-                return response.status_code == 200
+            client = await self._get_client()
+            response = await client.get(
+                "https://queue.fal.run/health",
+                headers={"Authorization": f"Key {self.api_key}"},
+                timeout=5.0
+            )
+            ok = response.status_code == 200
         except:
-            return False
+            ok = False
+        self._last_check, self._last_ok = now, ok
+        return ok
 
 # Helper functions for the FastAPI endpoints
 
+def _to_image_input(image: Union[str, bytes, Path]) -> ImageInput:
+    """Wrap a data URL, raw bytes or a spooled upload path as an ImageInput"""
+    if isinstance(image, Path):
+        return ImageInput(data=None, path=str(image))
+    return ImageInput(data=image)
+
 async def process_wan25_request(
     provider: FalAIProvider,
     prompt: str,
-    main_image: bytes,
-    reference_images: Optional[List[bytes]] = None,
+    main_image: Union[str, bytes, Path],
+    reference_images: Optional[List[Union[str, bytes, Path]]] = None,
     **kwargs
 ) -> Dict[str, Any]:
     """Process WAN-25 Preview generation request"""
     
     # Convert main image
-    main_img = ImageInput(data=main_image)
+    main_img = _to_image_input(main_image)
     
     # Convert reference images if provided
     ref_imgs = None
     if reference_images:
-        ref_imgs = [ImageInput(data=img) for img in reference_images]
+        ref_imgs = [_to_image_input(img) for img in reference_images]
     
     # Generate
     result = await provider.generate_wan25_preview(
@@ -410,7 +623,7 @@ async def process_wan25_request(
 
 async def process_qwen_edit_request(
     provider: FalAIProvider,
-    image: bytes,
+    image: Union[str, bytes, Path],
     instruction: str,
     mask: Optional[bytes] = None,
     **kwargs
@@ -418,7 +631,7 @@ async def process_qwen_edit_request(
     """Process Qwen Image Edit request"""
     
     # Convert images
-    img = ImageInput(data=image)
+    img = _to_image_input(image)
     mask_img = ImageInput(data=mask) if mask else None
     
     # Edit
@@ -433,7 +646,7 @@ async def process_qwen_edit_request(
 
 async def process_product_shoot_request(
     provider: FalAIProvider,
-    product_images: List[bytes],
+    product_images: List[Union[str, bytes, Path]],
     category: str,
     description: str,
     **kwargs
@@ -441,7 +654,7 @@ async def process_product_shoot_request(
     """Process Product Photoshoot request"""
     
     # Convert images
-    imgs = [ImageInput(data=img) for img in product_images]
+    imgs = [_to_image_input(img) for img in product_images]
     
     # Generate product shots
     result = await provider.generate_product_shots(
@@ -452,5 +665,3 @@ async def process_product_shoot_request(
     )
     
     return result
-
-import asyncio  # Add this import at the top
\ No newline at end of file
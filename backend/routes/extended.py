@@ -1,5 +1,11 @@
 # Add this to backend/routes/extended.py
 
+import binascii
+from backend.utils.b64 import b64decode
+
+# Base64 image payloads larger than this are rejected before any decoding
+MAX_B64_IMAGE_BYTES = 25 * 1024 * 1024
+
 @router.post("/wan25-i2v")
 async def generate_wan25_i2v(
     request: Request,
@@ -23,6 +29,21 @@ async def generate_wan25_i2v(
                 detail="Prompt must be at least 10 characters long"
             )
         
+        if len(image_data) > MAX_B64_IMAGE_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Image data exceeds {MAX_B64_IMAGE_BYTES // (1024 * 1024)} MB"
+            )
+        
+        # Validate the base64 once up front; the provider forwards the original string as-is
+        try:
+            b64decode(image_data, validate=True)
+        except (binascii.Error, ValueError):
+            raise HTTPException(
+                status_code=400,
+                detail="Image data must be valid base64"
+            )
+        
         if duration < 3 or duration > 10:
             raise HTTPException(
                 status_code=400,
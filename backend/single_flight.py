@@ -0,0 +1,32 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Runs one upstream call per key at a time; concurrent callers with the same key share its result"""
+    
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Await call(), or join the call already in flight for key"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            logger.info(f"Joined in-flight call for {key}")
+        
+        # Shielded so one caller disconnecting doesn't cancel the call for everyone else
+        return await asyncio.shield(task)
+    
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception retrieved in case every waiter has already gone away
+        if not task.cancelled():
+            task.exception()
\ No newline at end of file
@@ -0,0 +1,10 @@
+try:
+    import pybase64 as _b64  # SIMD-accelerated drop-in for the stdlib module
+except ImportError:
+    import base64 as _b64
+
+b64encode = _b64.b64encode
+b64decode = _b64.b64decode
+
+# pybase64 picks AVX2/SSSE3/NEON or scalar code at import based on the CPU
+B64_BACKEND = _b64.get_version() if hasattr(_b64, "get_version") else "stdlib base64"
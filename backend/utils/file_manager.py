@@ -1,2 +1,5 @@
 class FileManager:
-    def setup_directories(self): pass
\ No newline at end of file
+    def setup_directories(self): pass
+
+
+file_manager = FileManager()
\ No newline at end of file
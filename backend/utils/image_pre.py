@@ -0,0 +1,38 @@
+import asyncio
+from io import BytesIO
+from pathlib import Path
+from typing import Union
+from PIL import Image
+
+from backend.utils.b64 import b64encode
+
+DEFAULT_MAX_EDGE = 1024
+
+
+def _shrink_and_b64(data: Union[bytes, Path], max_edge: int) -> str:
+    source = BytesIO(data) if isinstance(data, bytes) else data
+    with Image.open(source) as img:
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        
+        # JPEG has no alpha channel, so flatten transparency onto white
+        if img.mode in ("RGBA", "LA", "P"):
+            rgba = img.convert("RGBA")
+            flattened = Image.new("RGB", rgba.size, (255, 255, 255))
+            flattened.paste(rgba, mask=rgba.getchannel("A"))
+        else:
+            flattened = img.convert("RGB")
+        
+        buf = BytesIO()
+        flattened.save(buf, "JPEG", quality=90)
+    
+    return b64encode(buf.getvalue()).decode()
+
+
+async def shrink_and_b64(data: Union[bytes, Path], max_edge: int = DEFAULT_MAX_EDGE) -> str:
+    """Downscale an image to fit within max_edge and return it as base64 JPEG"""
+    return await asyncio.to_thread(_shrink_and_b64, data, max_edge)
+
+
+async def shrink_to_data_url(data: Union[bytes, Path], max_edge: int = DEFAULT_MAX_EDGE) -> str:
+    """Downscale an image and return it as a JPEG data URL for the provider"""
+    return f"data:image/jpeg;base64,{await shrink_and_b64(data, max_edge)}"
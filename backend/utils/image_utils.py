@@ -1,27 +1,159 @@
 import os
+import re
+import asyncio
 import httpx
+import aiofiles
 import hashlib
+import tempfile
+import uuid
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
+from typing import Iterable, List, Optional
+from fastapi import HTTPException, UploadFile
+from backend.config import settings
 
-async def save_image_locally(image_url: str, prompt: str) -> str:
+UPLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+SAVED_CACHE_SIZE = 1024
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9 _-]")
+
+# image URL -> saved path, and content sha256 -> saved path, for de-duplicating downloads
+_saved_by_url: "OrderedDict[str, str]" = OrderedDict()
+_saved_by_hash: "OrderedDict[str, str]" = OrderedDict()
+
+async def save_image_locally(image_url: str, prompt: str, client: Optional[httpx.AsyncClient] = None) -> str:
     """Download and save image to local storage"""
     
-    # Create filename with timestamp
+    # The same result URL is only fetched once while its file is still on disk
+    cached = _saved_by_url.get(image_url)
+    if cached is not None and os.path.exists(cached):
+        _saved_by_url.move_to_end(image_url)
+        return cached
+    
+    # Timestamp for readability plus a random suffix so same-second saves never share a path
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_prompt = "".join(c for c in prompt[:30] if c.isalnum() or c in " -_")
-    filename = f"{timestamp}_{safe_prompt}.png"
+    safe_prompt = _UNSAFE_FILENAME_CHARS.sub("", prompt[:30])
+    filename = f"{timestamp}_{safe_prompt}_{uuid.uuid4().hex[:8]}.png"
     
     # Ensure storage directory exists
     storage_path = Path("storage/images")
     storage_path.mkdir(parents=True, exist_ok=True)
     
-    # Download image
-    async with httpx.AsyncClient() as client:
-        response = await client.get(image_url)
-        
-    # Save to file
+    # Stream to a .part file and rename on success so readers never see a partial image
     file_path = storage_path / filename
-    file_path.write_bytes(response.content)
+    part_path = file_path.with_name(filename + ".part")
+    try:
+        if client is None:
+            async with httpx.AsyncClient() as own_client:
+                digest = await _stream_to_file(own_client, image_url, part_path)
+        else:
+            digest = await _stream_to_file(client, image_url, part_path)
+        _store(part_path, file_path, digest)
+    except FileExistsError:
+        # Another save owns this .part file; leave it alone
+        raise
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
     
+    _remember(_saved_by_url, image_url, str(file_path))
     return str(file_path)
+
+def _store(part_path: Path, file_path: Path, digest: str):
+    """Move a finished download into place, hardlinking to an identical earlier file if there is one"""
+    existing = _saved_by_hash.get(digest)
+    if existing is not None and os.path.exists(existing):
+        try:
+            os.link(existing, file_path)
+            part_path.unlink()
+            return
+        except OSError:
+            pass
+    os.replace(part_path, file_path)
+    _remember(_saved_by_hash, digest, str(file_path))
+
+def _remember(cache: "OrderedDict[str, str]", key: str, value: str):
+    """Insert into a bounded LRU mapping"""
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > SAVED_CACHE_SIZE:
+        cache.popitem(last=False)
+
+async def _stream_to_file(client: httpx.AsyncClient, url: str, path: Path) -> str:
+    """Stream a GET response body to a new file in fixed-size chunks, returning its sha256"""
+    h = hashlib.sha256()
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        # "xb" fails rather than sharing or truncating a file another save created
+        async with aiofiles.open(path, "xb") as f:
+            async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                h.update(chunk)
+                await f.write(chunk)
+    return h.hexdigest()
+
+async def spool_upload(upload: UploadFile) -> Path:
+    """Stream an uploaded file to a temp file in chunks and return its path"""
+    
+    temp_dir = settings.STORAGE_PATH / settings.TEMP_DIR
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    
+    suffix = Path(upload.filename or "").suffix
+    fd, name = tempfile.mkstemp(dir=temp_dir, suffix=suffix)
+    os.close(fd)
+    path = Path(name)
+    
+    # Remove the temp file if the upload fails partway so it doesn't leak into storage/temp
+    try:
+        async with aiofiles.open(path, "wb") as f:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                await f.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    
+    return path
+
+async def spool_uploads(uploads: List[UploadFile], limit: int = 4) -> List[Path]:
+    """Spool several uploads concurrently, at most `limit` at a time"""
+    
+    semaphore = asyncio.Semaphore(limit)
+    
+    async def _spool(upload: UploadFile) -> Path:
+        async with semaphore:
+            return await spool_upload(upload)
+    
+    results = await asyncio.gather(*(_spool(u) for u in uploads), return_exceptions=True)
+    paths = [r for r in results if isinstance(r, Path)]
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        remove_temp_files(paths)
+        raise errors[0]
+    
+    return paths
+
+async def spool(upload: UploadFile, max_mem: int = 1 << 20) -> tempfile.SpooledTemporaryFile:
+    """Stream an upload into a spooled temp file that only hits disk past max_mem bytes"""
+    
+    if upload.size is not None and upload.size > settings.MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail="Uploaded file is too large")
+    
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_mem)
+    total = 0
+    try:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            total += len(chunk)
+            if total > settings.MAX_UPLOAD_SIZE:
+                raise HTTPException(status_code=413, detail="Uploaded file is too large")
+            spooled.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    
+    spooled.seek(0)
+    return spooled
+
+def remove_temp_files(paths: Iterable[Path]):
+    """Delete spooled temp files, ignoring ones already gone"""
+    for path in paths:
+        path.unlink(missing_ok=True)
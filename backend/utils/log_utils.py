@@ -0,0 +1,72 @@
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Tuple
+from pythonjsonlogger import jsonlogger
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class RateLimitFilter(logging.Filter):
+    """Drop repeats of the same failure beyond `burst` records per `period` seconds; other records pass"""
+    
+    def __init__(self, burst: int = 5, period: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self._windows: Dict[Tuple, Tuple[float, int]] = {}
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Only tracebacks and errors are throttled; routine INFO/WARNING logging is untouched
+        if not record.exc_info and record.levelno < logging.ERROR:
+            return True
+        
+        # Keyed on the call site rather than the (usually f-string) message
+        exc_type = record.exc_info[0] if record.exc_info else None
+        key = (record.name, record.lineno, exc_type)
+        now = time.monotonic()
+        
+        with self._lock:
+            if now >= self._next_prune:
+                self._windows = {k: w for k, w in self._windows.items() if now - w[0] < self.period}
+                self._next_prune = now + self.period
+            start, count = self._windows.get(key, (now, 0))
+            if now - start >= self.period:
+                start, count = now, 0
+            self._windows[key] = (start, count + 1)
+        
+        return count < self.burst
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves message and traceback formatting to the listener thread"""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue is in-process, so the record can be handed over as-is
+        return record
+
+
+def setup_logging(level: int = logging.INFO, json_output: bool = False) -> QueueListener:
+    """Route root logging through a background queue listener and return it"""
+    stream_handler = logging.StreamHandler()
+    if json_output:
+        # Fields passed via `extra=` (e.g. generation_id) become top-level JSON keys
+        stream_handler.setFormatter(jsonlogger.JsonFormatter(LOG_FORMAT.replace(" - ", " ")))
+    else:
+        stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    
+    log_queue = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter())
+    
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers[:] = [queue_handler]
+    
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
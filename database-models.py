@@ -1,9 +1,10 @@
 # backend/models.py
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, JSON, Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, JSON, Enum, Index, LargeBinary, insert
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, Session
 from sqlalchemy.sql import func
 from datetime import datetime
+from typing import Any, Dict, List
 import enum
 
 Base = declarative_base()
@@ -156,6 +157,10 @@ class Generation(Base):
     model = relationship("Model", back_populates="generations")
     images = relationship("Image", back_populates="generation", cascade="all, delete-orphan")
     collections = relationship("GenerationCollection", back_populates="generation")
+    
+    __table_args__ = (
+        Index("ix_gen_project_created", "project_id", "created_at"),
+    )
 
 
 class Image(Base):
@@ -168,7 +173,7 @@ class Image(Base):
     file_path = Column(String(500), nullable=False)
     thumbnail_path = Column(String(500))
     file_size = Column(Integer)  # bytes
-    file_hash = Column(String(64))  # SHA256
+    file_hash = Column(LargeBinary(32), index=True)  # raw SHA256 digest; not unique, identical outputs are hardlinked
     
     # Image properties
     width = Column(Integer)
@@ -187,6 +192,16 @@ class Image(Base):
     
     # Relationships
     generation = relationship("Generation", back_populates="images")
+    
+    __table_args__ = (
+        Index("ix_image_gen", "generation_id"),
+    )
+
+
+def bulk_save_images(session: Session, generation_id: int, images: List[Dict[str, Any]]):
+    """Insert all images of a generation in one executemany instead of per-row ORM adds"""
+    if images:
+        session.execute(insert(Image), [{**image, "generation_id": generation_id} for image in images])
 
 
 class GenerationCollection(Base):
@@ -1,12 +1,15 @@
 # desktop.py
 import webview
-import threading
 import uvicorn
 import sys
 import time
+import platform
+import subprocess
+import socket
 import requests
 import argparse
 from pathlib import Path
+from multiprocessing import Process, freeze_support
 import logging
 
 # Configure logging
@@ -16,29 +19,88 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# uvloop isn't available on Windows; fall back to the stock asyncio loop there
+try:
+    if sys.platform == "win32":
+        raise ImportError
+    import uvloop  # noqa: F401
+    SERVER_LOOP = "uvloop"
+except ImportError:
+    SERVER_LOOP = "asyncio"
+
+# OS details don't change at runtime; resolve them once
+_SYSTEM = platform.system()
+_OPEN_FOLDER_CMD = {"Windows": ["explorer"], "Darwin": ["open"]}.get(_SYSTEM, ["xdg-open"])
+_SYSTEM_INFO = {
+    "platform": _SYSTEM,
+    "architecture": platform.machine(),
+    "python_version": platform.python_version()
+}
+
+# Injected natively into the page once the window loads
+DESKTOP_CSS = """
+/* Custom scrollbar */
+::-webkit-scrollbar {
+    width: 12px;
+    height: 12px;
+}
+::-webkit-scrollbar-track {
+    background: #2a2a2a;
+}
+::-webkit-scrollbar-thumb {
+    background: #555;
+    border-radius: 6px;
+}
+::-webkit-scrollbar-thumb:hover {
+    background: #777;
+}
+
+/* Prevent text selection on UI elements */
+.button, .tab, .toolbar, .sidebar {
+    -webkit-user-select: none;
+    user-select: none;
+}
+
+/* Native-like context menus */
+.context-menu {
+    -webkit-app-region: no-drag;
+}
+"""
+
+
+def _run_uvicorn(host, port, dev_mode):
+    """Serve the FastAPI app; runs in a child process so it doesn't share the webview's GIL"""
+    logger.info(f"Starting FastAPI server on {host}:{port}")
+    # No reload here: the webview window can't survive a server process restart,
+    # so use `uvicorn backend.main:app --reload` directly for hot reload
+    uvicorn.run(
+        "backend.main:app",
+        host=host,
+        port=port,
+        loop=SERVER_LOOP,
+        http="httptools",
+        log_level="info" if dev_mode else "warning",
+        access_log=dev_mode,
+        workers=1
+    )
+
 
 class DesktopApp:
     def __init__(self, dev_mode=False):
         self.dev_mode = dev_mode
         self.host = "127.0.0.1"
         self.port = 8000
-        self.server_thread = None
+        self.server_proc = None
         self.window = None
         
     def start_server(self):
-        """Start the FastAPI server in a separate thread"""
-        def run():
-            logger.info(f"Starting FastAPI server on {self.host}:{self.port}")
-            uvicorn.run(
-                "backend.main:app",
-                host=self.host,
-                port=self.port,
-                reload=self.dev_mode,
-                log_level="info" if self.dev_mode else "warning"
-            )
-        
-        self.server_thread = threading.Thread(target=run, daemon=True)
-        self.server_thread.start()
+        """Start the FastAPI server in a separate process"""
+        self.server_proc = Process(
+            target=_run_uvicorn,
+            args=(self.host, self.port, self.dev_mode),
+            daemon=True
+        )
+        self.server_proc.start()
         
         # Wait for server to start
         self.wait_for_server()
@@ -46,17 +108,23 @@ class DesktopApp:
     def wait_for_server(self, timeout=30):
         """Wait for the server to be ready"""
         logger.info("Waiting for server to start...")
-        start_time = time.time()
+        deadline = time.monotonic() + timeout
+        delay = 0.05
         
-        while time.time() - start_time < timeout:
-            try:
-                response = requests.get(f"http://{self.host}:{self.port}/health")
-                if response.status_code == 200:
-                    logger.info("Server is ready!")
-                    return True
-            except requests.exceptions.ConnectionError:
-                pass
-            time.sleep(0.5)
+        # One keep-alive session for every probe instead of a new connection each time
+        with requests.Session() as session:
+            while time.monotonic() < deadline:
+                # Cheap TCP probe first; only speak HTTP once the port is listening
+                try:
+                    socket.create_connection((self.host, self.port), timeout=0.1).close()
+                    response = session.get(f"http://{self.host}:{self.port}/health", timeout=0.25)
+                    if response.status_code == 200:
+                        logger.info("Server is ready!")
+                        return True
+                except (OSError, requests.exceptions.RequestException):
+                    pass
+                time.sleep(delay)
+                delay = min(delay * 1.6, 1.0)
         
         logger.error("Server failed to start within timeout")
         return False
@@ -92,44 +160,19 @@ class DesktopApp:
         logger.info("Window loaded successfully")
         
         # Inject custom CSS for better desktop experience
-        css = """
-        /* Custom scrollbar */
-        ::-webkit-scrollbar {
-            width: 12px;
-            height: 12px;
-        }
-        ::-webkit-scrollbar-track {
-            background: #2a2a2a;
-        }
-        ::-webkit-scrollbar-thumb {
-            background: #555;
-            border-radius: 6px;
-        }
-        ::-webkit-scrollbar-thumb:hover {
-            background: #777;
-        }
-        
-        /* Prevent text selection on UI elements */
-        .button, .tab, .toolbar, .sidebar {
-            -webkit-user-select: none;
-            user-select: none;
-        }
-        
-        /* Native-like context menus */
-        .context-menu {
-            -webkit-app-region: no-drag;
-        }
-        """
-        self.window.evaluate_js(f"""
-            const style = document.createElement('style');
-            style.textContent = `{css}`;
-            document.head.appendChild(style);
-        """)
+        self.window.load_css(DESKTOP_CSS)
     
     def on_closed(self):
         """Called when the window is closed"""
         logger.info("Window closed, shutting down...")
+        self.stop_server()
         sys.exit(0)
+
+    def stop_server(self):
+        """Terminate the server process if it is still running"""
+        if self.server_proc is not None and self.server_proc.is_alive():
+            self.server_proc.terminate()
+            self.server_proc.join(2)
     
     def expose_api(self):
         """Expose Python functions to JavaScript"""
@@ -137,26 +180,13 @@ class DesktopApp:
             @staticmethod
             def open_folder(path):
                 """Open a folder in the system file explorer"""
-                import subprocess
-                import platform
-                
-                system = platform.system()
-                if system == "Windows":
-                    subprocess.run(["explorer", path])
-                elif system == "Darwin":  # macOS
-                    subprocess.run(["open", path])
-                else:  # Linux
-                    subprocess.run(["xdg-open", path])
+                # Popen, not run: don't block the webview thread waiting on the file manager
+                subprocess.Popen([*_OPEN_FOLDER_CMD, path], close_fds=True)
             
             @staticmethod
             def get_system_info():
                 """Get system information"""
-                import platform
-                return {
-                    "platform": platform.system(),
-                    "architecture": platform.machine(),
-                    "python_version": platform.python_version()
-                }
+                return _SYSTEM_INFO
             
             @staticmethod
             def save_file_dialog(default_name="image.png"):
@@ -204,6 +234,7 @@ class DesktopApp:
         except Exception as e:
             logger.error(f"Application error: {e}")
         finally:
+            self.stop_server()
             logger.info("Application shutdown complete")
 
 
@@ -244,4 +275,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Needed for the server Process when running as a frozen executable
+    freeze_support()
     main()
\ No newline at end of file
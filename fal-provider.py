@@ -1,41 +1,217 @@
 # backend/providers/fal_ai.py
 import httpx
+import orjson
 import asyncio
-from typing import Dict, Any, Optional
+import aiofiles
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Union
 from backend.providers.base import BaseProvider, GenerationResult
 from backend.config import settings
 import base64
 import io
 from PIL import Image
 
+QUEUE_URL = "https://queue.fal.run"
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Approximate costs per 1024x1024 generation (in USD), scaled linearly by pixel count
+_BASE_COST = {
+    "flux-pro": 0.05,
+    "flux-dev": 0.03,
+    "flux-schnell": 0.01,
+    "sdxl": 0.003,
+    "sd15": 0.001,
+    "lightning-sdxl": 0.002,
+    "stable-cascade": 0.004
+}
+_BASE_PIXELS = 1024 * 1024
+_COST_PER_PIXEL = {model: cost / _BASE_PIXELS for model, cost in _BASE_COST.items()}
+_DEFAULT_COST_PER_PIXEL = 0.003 / _BASE_PIXELS
+
+_MODEL_ENDPOINTS = MappingProxyType({
+    "flux-pro": "fal-ai/flux-pro",
+    "flux-dev": "fal-ai/flux/dev",
+    "flux-schnell": "fal-ai/flux/schnell",
+    "sdxl": "fal-ai/fast-sdxl",
+    "sd15": "fal-ai/stable-diffusion-v1-5",
+    "lightning-sdxl": "fal-ai/fast-lightning-sdxl",
+    "lcm-sdxl": "fal-ai/lcm-sd15",
+    "stable-cascade": "fal-ai/stable-cascade",
+    "pixart-sigma": "fal-ai/pixart-sigma",
+    "aura-flow": "fal-ai/aura-flow"
+})
+
+_SAMPLER_MAP = MappingProxyType({
+    "DPM++ 2M Karras": "DPMSolverMultistep",
+    "Euler a": "EulerAncestralDiscrete",
+    "Euler": "EulerDiscrete",
+    "DDIM": "DDIM",
+    "LMS": "LMSDiscrete",
+    "PNDM": "PNDM",
+    "DDPM": "DDPM"
+})
+
+# Built once; plain dicts so the response serializes directly. Treat as read-only.
+_MODELS = (
+    {
+        "id": "flux-pro",
+        "name": "Flux Pro",
+        "description": "Latest Flux model with best quality",
+        "max_width": 1920,
+        "max_height": 1920,
+        "supports_img2img": True,
+        "supports_inpainting": False
+    },
+    {
+        "id": "flux-dev",
+        "name": "Flux Dev",
+        "description": "Development version of Flux",
+        "max_width": 1920,
+        "max_height": 1920,
+        "supports_img2img": True,
+        "supports_inpainting": False
+    },
+    {
+        "id": "flux-schnell",
+        "name": "Flux Schnell",
+        "description": "Fast Flux generation",
+        "max_width": 1920,
+        "max_height": 1920,
+        "supports_img2img": False,
+        "supports_inpainting": False
+    },
+    {
+        "id": "sdxl",
+        "name": "Stable Diffusion XL",
+        "description": "SDXL with fast generation",
+        "max_width": 1536,
+        "max_height": 1536,
+        "supports_img2img": True,
+        "supports_inpainting": True
+    },
+    {
+        "id": "sd15",
+        "name": "Stable Diffusion 1.5",
+        "description": "Classic SD 1.5 model",
+        "max_width": 768,
+        "max_height": 768,
+        "supports_img2img": True,
+        "supports_inpainting": True
+    },
+    {
+        "id": "lightning-sdxl",
+        "name": "Lightning SDXL",
+        "description": "Ultra-fast SDXL variant",
+        "max_width": 1024,
+        "max_height": 1024,
+        "supports_img2img": False,
+        "supports_inpainting": False
+    }
+)
+
+
+def _build_flux(prompt, negative_prompt, width, height, steps, cfg_scale, seed, sampler, kwargs) -> Dict[str, Any]:
+    """Flux models: optional parameters are only sent when set"""
+    payload = {"prompt": prompt, "image_size": {"width": width, "height": height}}
+    if negative_prompt:
+        payload["negative_prompt"] = negative_prompt
+    if steps:
+        payload["num_inference_steps"] = steps
+    if cfg_scale:
+        payload["guidance_scale"] = cfg_scale
+    if seed and seed != -1:
+        payload["seed"] = seed
+    return payload
+
+
+def _build_sd(prompt, negative_prompt, width, height, steps, cfg_scale, seed, sampler, kwargs) -> Dict[str, Any]:
+    """Stable Diffusion models, including safety checker and image-to-image options"""
+    payload = {
+        "prompt": prompt,
+        "image_size": {"width": width, "height": height},
+        "num_inference_steps": steps,
+        "guidance_scale": cfg_scale,
+        "enable_safety_checker": kwargs.get("safety_checker", False)
+    }
+    if negative_prompt:
+        payload["negative_prompt"] = negative_prompt
+    if seed and seed != -1:
+        payload["seed"] = seed
+    if sampler:
+        payload["scheduler"] = _SAMPLER_MAP.get(sampler, "DPMSolverMultistep")
+    if kwargs.get("init_image"):
+        payload["init_image"] = kwargs["init_image"]
+        payload["strength"] = kwargs.get("denoising_strength", 0.75)
+    return payload
+
+
+def _build_default(prompt, negative_prompt, width, height, steps, cfg_scale, seed, sampler, kwargs) -> Dict[str, Any]:
+    """Other models only get the prompt and size"""
+    return {"prompt": prompt, "image_size": {"width": width, "height": height}}
+
+
+# Keyed on the app's model names; families follow the endpoint each name maps to
+_PAYLOAD_BUILDERS = MappingProxyType({
+    "flux-pro": _build_flux,
+    "flux-dev": _build_flux,
+    "flux-schnell": _build_flux,
+    "sdxl": _build_sd,
+    "sd15": _build_sd,
+    "lightning-sdxl": _build_sd,
+    "lcm-sdxl": _build_sd,
+    "stable-cascade": _build_default,
+    "pixart-sigma": _build_default,
+    "aura-flow": _build_default
+})
+
+
+def _builder_for_endpoint(endpoint: str):
+    """Fallback for raw endpoint ids that aren't in the model table"""
+    if "flux" in endpoint:
+        return _build_flux
+    if "sdxl" in endpoint or "sd15" in endpoint:
+        return _build_sd
+    return _build_default
+
 
 class FalAIProvider(BaseProvider):
     """Fal.ai provider implementation"""
     
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
         super().__init__()
         self.name = "Fal.ai"
         self.base_url = "https://fal.run"
         self.api_key = settings.FAL_API_KEY
         
-        # Model mappings
-        self.models = {
-            "flux-pro": "fal-ai/flux-pro",
-            "flux-dev": "fal-ai/flux/dev",
-            "flux-schnell": "fal-ai/flux/schnell",
-            "sdxl": "fal-ai/fast-sdxl",
-            "sd15": "fal-ai/stable-diffusion-v1-5",
-            "lightning-sdxl": "fal-ai/fast-lightning-sdxl",
-            "lcm-sdxl": "fal-ai/lcm-sd15",
-            "stable-cascade": "fal-ai/stable-cascade",
-            "pixart-sigma": "fal-ai/pixart-sigma",
-            "aura-flow": "fal-ai/aura-flow"
-        }
+        # Model mappings, shared by every provider instance
+        self.models = _MODEL_ENDPOINTS
         
         self.headers = {
             "Authorization": f"Key {self.api_key}",
             "Content-Type": "application/json"
         }
+        
+        # Pooled client shared by every call; an injected client may be shared across
+        # providers, so auth headers are sent per request rather than set on the client
+        self._client = client
+        self._owns_client = client is None
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Return the provider's pooled HTTP/2 client, creating it if needed"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(120.0, connect=5.0),
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+            )
+        return self._client
+    
+    async def aclose(self):
+        """Close the pooled client if this provider created it"""
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     async def generate_image(
         self,
@@ -57,52 +233,68 @@ class FalAIProvider(BaseProvider):
         
         # Build request payload based on model
         payload = self._build_payload(
-            model_endpoint, prompt, negative_prompt,
+            model, model_endpoint, prompt, negative_prompt,
             width, height, steps, cfg_scale, seed, sampler, **kwargs
         )
         
         try:
-            async with httpx.AsyncClient() as client:
-                # Submit generation request
-                response = await client.post(
-                    f"{self.base_url}/{model_endpoint}",
-                    headers=self.headers,
-                    json=payload,
-                    timeout=120.0
-                )
-                
-                if response.status_code != 200:
-                    raise Exception(f"Fal.ai API error: {response.text}")
-                
-                result = response.json()
-                
-                # Handle different response formats
-                if "images" in result:
-                    image_url = result["images"][0]["url"]
-                elif "image" in result:
-                    image_url = result["image"]["url"]
-                else:
-                    raise Exception("Unexpected response format from Fal.ai")
-                
-                # Download the image
-                image_data = await self._download_image(client, image_url)
-                
+            client = await self._get_client()
+            
+            # Submit to the queue and free the event loop between status polls
+            webhook_url = kwargs.get("webhook_url")
+            response = await client.post(
+                f"{QUEUE_URL}/{model_endpoint}",
+                params={"fal_webhook": webhook_url} if webhook_url else None,
+                headers=self.headers,
+                content=orjson.dumps(payload)
+            )
+            
+            if response.status_code != 200:
+                raise Exception(f"Fal.ai API error: {response.text}")
+            
+            submitted = orjson.loads(response.content)
+            if webhook_url:
+                # The webhook receives the result; nothing to wait for here
                 return GenerationResult(
                     success=True,
-                    image_data=image_data,
-                    metadata={
-                        "model": model,
-                        "width": width,
-                        "height": height,
-                        "steps": steps,
-                        "cfg_scale": cfg_scale,
-                        "seed": result.get("seed", seed),
-                        "sampler": sampler,
-                        "provider": "fal.ai"
-                    },
-                    cost=self._calculate_cost(model, width, height)
+                    metadata={"request_id": submitted["request_id"], "status": "queued", "provider": "fal.ai"}
                 )
-                
+            
+            await self._await_completion(client, submitted["status_url"])
+            
+            response = await client.get(submitted["response_url"], headers=self.headers)
+            if response.status_code != 200:
+                raise Exception(f"Fal.ai API error: {response.text}")
+            
+            result = orjson.loads(response.content)
+            
+            # Handle different response formats
+            if "images" in result:
+                image_url = result["images"][0]["url"]
+            elif "image" in result:
+                image_url = result["image"]["url"]
+            else:
+                raise Exception("Unexpected response format from Fal.ai")
+            
+            # Download the image
+            image_data = await self._download_image(client, image_url)
+            
+            return GenerationResult(
+                success=True,
+                image_data=image_data,
+                metadata={
+                    "model": model,
+                    "width": width,
+                    "height": height,
+                    "steps": steps,
+                    "cfg_scale": cfg_scale,
+                    "seed": result.get("seed", seed),
+                    "sampler": sampler,
+                    "provider": "fal.ai"
+                },
+                cost=self._calculate_cost(model, width, height)
+            )
+            
         except asyncio.TimeoutError:
             raise Exception("Generation timed out")
         except Exception as e:
@@ -111,9 +303,35 @@ class FalAIProvider(BaseProvider):
                 error=str(e)
             )
     
+    async def _await_completion(self, client: httpx.AsyncClient, status_url: str, timeout: float = 120.0):
+        """Poll a queued request with exponential backoff until it completes"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        attempt = 0
+        while loop.time() < deadline:
+            await asyncio.sleep(min(0.25 * 2 ** attempt, 5.0))
+            attempt += 1
+            # Transport errors and 5xx are transient: back off and poll again
+            try:
+                response = await client.get(status_url, headers=self.headers)
+            except httpx.TransportError:
+                continue
+            if 400 <= response.status_code < 500:
+                # Bad key, unknown request id, etc. won't fix themselves; don't wait out the deadline
+                raise Exception(f"Fal.ai status check failed ({response.status_code}): {response.text}")
+            if response.status_code not in (200, 202):
+                continue
+            status = orjson.loads(response.content).get("status")
+            if status == "COMPLETED":
+                return
+            if status in ("FAILED", "ERROR"):
+                raise Exception(f"Fal.ai generation failed: {response.text}")
+        raise asyncio.TimeoutError()
+    
     def _build_payload(
         self,
         model: str,
+        model_endpoint: str,
         prompt: str,
         negative_prompt: Optional[str],
         width: int,
@@ -125,45 +343,8 @@ class FalAIProvider(BaseProvider):
         **kwargs
     ) -> Dict[str, Any]:
         """Build request payload based on model requirements"""
-        
-        # Base payload
-        payload = {
-            "prompt": prompt,
-            "image_size": {
-                "width": width,
-                "height": height
-            }
-        }
-        
-        # Add optional parameters based on model
-        if "flux" in model:
-            # Flux models have different parameters
-            if negative_prompt:
-                payload["negative_prompt"] = negative_prompt
-            if steps:
-                payload["num_inference_steps"] = steps
-            if cfg_scale:
-                payload["guidance_scale"] = cfg_scale
-            if seed and seed != -1:
-                payload["seed"] = seed
-        elif "sdxl" in model or "sd15" in model:
-            # Stable Diffusion models
-            if negative_prompt:
-                payload["negative_prompt"] = negative_prompt
-            payload["num_inference_steps"] = steps
-            payload["guidance_scale"] = cfg_scale
-            if seed and seed != -1:
-                payload["seed"] = seed
-            if sampler:
-                payload["scheduler"] = self._map_sampler(sampler)
-            
-            # Enable safety checker option
-            payload["enable_safety_checker"] = kwargs.get("safety_checker", False)
-            
-            # Image-to-image parameters
-            if kwargs.get("init_image"):
-                payload["init_image"] = kwargs["init_image"]
-                payload["strength"] = kwargs.get("denoising_strength", 0.75)
+        builder = _PAYLOAD_BUILDERS.get(model) or _builder_for_endpoint(model_endpoint)
+        payload = builder(prompt, negative_prompt, width, height, steps, cfg_scale, seed, sampler, kwargs)
         
         # Add any extra model-specific parameters
         if kwargs.get("extra_params"):
@@ -171,127 +352,68 @@ class FalAIProvider(BaseProvider):
         
         return payload
     
-    def _map_sampler(self, sampler: str) -> str:
+    @staticmethod
+    def _map_sampler(sampler: str) -> str:
         """Map common sampler names to Fal.ai scheduler names"""
-        sampler_map = {
-            "DPM++ 2M Karras": "DPMSolverMultistep",
-            "Euler a": "EulerAncestralDiscrete",
-            "Euler": "EulerDiscrete",
-            "DDIM": "DDIM",
-            "LMS": "LMSDiscrete",
-            "PNDM": "PNDM",
-            "DDPM": "DDPM"
-        }
-        return sampler_map.get(sampler, "DPMSolverMultistep")
+        return _SAMPLER_MAP.get(sampler, "DPMSolverMultistep")
     
-    async def _download_image(self, client: httpx.AsyncClient, url: str) -> bytes:
-        """Download image from URL"""
-        response = await client.get(url)
-        if response.status_code != 200:
-            raise Exception(f"Failed to download image: {response.status_code}")
-        return response.content
+    async def _download_image(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        sink: Optional[Path] = None
+    ) -> Union[bytearray, Path]:
+        """Stream an image from URL into `sink` on disk, or into memory when no sink is given"""
+        async with client.stream("GET", url) as response:
+            if response.status_code != 200:
+                raise Exception(f"Failed to download image: {response.status_code}")
+            
+            if sink is not None:
+                async with aiofiles.open(sink, "wb") as f:
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        await f.write(chunk)
+                return sink
+            
+            # Fill a buffer sized from Content-Length so it never reallocates
+            length = response.headers.get("Content-Length")
+            if length is None or response.headers.get("Content-Encoding"):
+                buf = bytearray()
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    buf += chunk
+                return buf
+            
+            buf = bytearray(int(length))
+            offset = 0
+            with memoryview(buf) as view:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    view[offset:offset + len(chunk)] = chunk
+                    offset += len(chunk)
+            del buf[offset:]
+            return buf
     
-    def _calculate_cost(self, model: str, width: int, height: int) -> float:
+    @staticmethod
+    def _calculate_cost(model: str, width: int, height: int) -> float:
         """Calculate generation cost based on model and resolution"""
-        # Approximate costs per generation (in USD)
-        cost_map = {
-            "flux-pro": 0.05,
-            "flux-dev": 0.03,
-            "flux-schnell": 0.01,
-            "sdxl": 0.003,
-            "sd15": 0.001,
-            "lightning-sdxl": 0.002,
-            "stable-cascade": 0.004
-        }
-        
-        base_cost = cost_map.get(model, 0.003)
-        
-        # Adjust for resolution
-        pixels = width * height
-        base_pixels = 1024 * 1024
-        resolution_multiplier = pixels / base_pixels
-        
-        return base_cost * resolution_multiplier
+        return _COST_PER_PIXEL.get(model, _DEFAULT_COST_PER_PIXEL) * width * height
     
-    async def list_models(self) -> list:
+    async def list_models(self) -> tuple:
         """List available models"""
-        return [
-            {
-                "id": "flux-pro",
-                "name": "Flux Pro",
-                "description": "Latest Flux model with best quality",
-                "max_width": 1920,
-                "max_height": 1920,
-                "supports_img2img": True,
-                "supports_inpainting": False
-            },
-            {
-                "id": "flux-dev",
-                "name": "Flux Dev",
-                "description": "Development version of Flux",
-                "max_width": 1920,
-                "max_height": 1920,
-                "supports_img2img": True,
-                "supports_inpainting": False
-            },
-            {
-                "id": "flux-schnell",
-                "name": "Flux Schnell",
-                "description": "Fast Flux generation",
-                "max_width": 1920,
-                "max_height": 1920,
-                "supports_img2img": False,
-                "supports_inpainting": False
-            },
-            {
-                "id": "sdxl",
-                "name": "Stable Diffusion XL",
-                "description": "SDXL with fast generation",
-                "max_width": 1536,
-                "max_height": 1536,
-                "supports_img2img": True,
-                "supports_inpainting": True
-            },
-            {
-                "id": "sd15",
-                "name": "Stable Diffusion 1.5",
-                "description": "Classic SD 1.5 model",
-                "max_width": 768,
-                "max_height": 768,
-                "supports_img2img": True,
-                "supports_inpainting": True
-            },
-            {
-                "id": "lightning-sdxl",
-                "name": "Lightning SDXL",
-                "description": "Ultra-fast SDXL variant",
-                "max_width": 1024,
-                "max_height": 1024,
-                "supports_img2img": False,
-                "supports_inpainting": False
-            }
-        ]
+        return _MODELS
     
     async def check_status(self) -> bool:
         """Check if the provider is available"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/health",
-                    timeout=5.0
-                )
-                return response.status_code == 200
+            client = await self._get_client()
+            response = await client.get(f"{self.base_url}/health", timeout=5.0)
+            return response.status_code == 200
         except:
             return False
     
     async def get_queue_status(self, request_id: str) -> Dict[str, Any]:
         """Get status of a queued request"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/requests/{request_id}/status",
-                headers=self.headers
-            )
-            return response.json()
+        client = await self._get_client()
+        response = await client.get(f"{self.base_url}/requests/{request_id}/status", headers=self.headers)
+        return orjson.loads(response.content)
 
 
 # backend/providers/base.py
@@ -299,6 +421,9 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass
 
+_STEP_CLAMP = (1, 150)
+_CFG_CLAMP = (1.0, 30.0)
+
 
 @dataclass
 class GenerationResult:
@@ -347,39 +472,51 @@ class BaseProvider(ABC):
     
     def validate_parameters(self, **params) -> Dict[str, Any]:
         """Validate and adjust parameters for the provider"""
-        # Default validation
-        validated = {}
-        
-        # Ensure dimensions are within limits
-        validated["width"] = min(max(params.get("width", 512), 64), 2048)
-        validated["height"] = min(max(params.get("height", 512), 64), 2048)
-        
-        # Ensure dimensions are multiples of 8
-        validated["width"] = (validated["width"] // 8) * 8
-        validated["height"] = (validated["height"] // 8) * 8
-        
-        # Validate other parameters
-        validated["steps"] = min(max(params.get("steps", 20), 1), 150)
-        validated["cfg_scale"] = min(max(params.get("cfg_scale", 7.5), 1.0), 30.0)
-        
-        return validated
+        # Clamp dimensions to 64..2048 and round down to a multiple of 8
+        lo, hi = _STEP_CLAMP
+        cfg_lo, cfg_hi = _CFG_CLAMP
+        return {
+            "width": max(64, min(int(params.get("width", 512)), 2048)) & ~7,
+            "height": max(64, min(int(params.get("height", 512)), 2048)) & ~7,
+            "steps": max(lo, min(params.get("steps", 20), hi)),
+            "cfg_scale": max(cfg_lo, min(params.get("cfg_scale", 7.5), cfg_hi)),
+        }
 
 
 # backend/providers/__init__.py
+import asyncio
+from typing import Optional
+import httpx
 from backend.providers.fal_ai import FalAIProvider
 # from backend.providers.replicate_ai import ReplicateProvider
 # from backend.providers.openai_provider import OpenAIProvider
 # from backend.providers.openrouter import OpenRouterProvider
 
-def initialize_providers():
-    """Initialize all configured providers"""
-    providers = []
+async def initialize_providers(client: Optional[httpx.AsyncClient] = None):
+    """Initialize all configured providers and keep the ones whose status probe succeeds"""
+    candidates = []
     
     # Initialize Fal.ai if configured
     from backend.config import settings
     if settings.FAL_API_KEY:
-        providers.append(FalAIProvider())
+        candidates.append(FalAIProvider(client=client))
     
     # Add other providers...
     
-    return providers
\ No newline at end of file
+    # Probe all providers at once over the shared client: max(latency) instead of sum
+    statuses = await asyncio.gather(*(p.check_status() for p in candidates), return_exceptions=True)
+    providers = []
+    for provider, ok in zip(candidates, statuses):
+        if ok is True:
+            providers.append(provider)
+        else:
+            await provider.aclose()
+    return providers
+
+
+async def close_providers(providers, client: Optional[httpx.AsyncClient] = None):
+    """Close provider HTTP clients and the shared client; call from the FastAPI shutdown hook"""
+    for provider in providers:
+        await provider.aclose()
+    if client is not None:
+        await client.aclose()
\ No newline at end of file
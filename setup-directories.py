@@ -4,7 +4,6 @@ Setup script to create the directory structure for AI Image Generator
 """
 
 import os
-from pathlib import Path
 
 def create_directory_structure():
     """Create all necessary directories for the application"""
@@ -34,12 +33,12 @@ def create_directory_structure():
         "backend/utils",
     ]
     
-    # Create each directory
-    for dir_path in directories:
-        # Convert forward slashes to correct path separator for the OS
-        dir_path = Path(dir_path)
+    # Only leaf directories need a makedirs call; parents are created along the way
+    needed = {os.path.normpath(d) for d in directories}
+    leaves = sorted(d for d in needed if not any(o.startswith(d + os.sep) for o in needed))
+    for dir_path in leaves:
         try:
-            dir_path.mkdir(parents=True, exist_ok=True)
+            os.makedirs(dir_path, exist_ok=True)
             print(f"✓ Created: {dir_path}")
         except Exception as e:
             print(f"✗ Failed to create {dir_path}: {e}")
@@ -56,9 +55,9 @@ def create_directory_structure():
     
     print("\nCreating Python package files...")
     for package in python_packages:
-        init_file = Path(package) / "__init__.py"
+        init_file = os.path.join(package, "__init__.py")
         try:
-            init_file.touch(exist_ok=True)
+            os.close(os.open(init_file, os.O_CREAT | os.O_WRONLY, 0o644))
             print(f"✓ Created: {init_file}")
         except Exception as e:
             print(f"✗ Failed to create {init_file}: {e}")
@@ -143,16 +142,22 @@ Run in development mode: `python desktop.py --dev`
     
     print("\nCreating initial files...")
     for filename, content in files_to_create:
-        file_path = Path(filename)
         try:
-            # Don't overwrite existing files
-            if not file_path.exists():
-                file_path.write_text(content)
-                print(f"✓ Created: {filename}")
-            else:
-                print(f"⚠ Skipped (exists): {filename}")
+            # Don't overwrite existing files; O_EXCL makes the existence check part of the open
+            fd = os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            print(f"⚠ Skipped (exists): {filename}")
+            continue
         except Exception as e:
             print(f"✗ Failed to create {filename}: {e}")
+            continue
+        try:
+            os.write(fd, content.encode())
+            print(f"✓ Created: {filename}")
+        except Exception as e:
+            print(f"✗ Failed to create {filename}: {e}")
+        finally:
+            os.close(fd)
 
 if __name__ == "__main__":
     print("🚀 Setting up AI Image Generator directory structure...")
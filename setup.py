@@ -1,5 +1,4 @@
 import os
-from pathlib import Path
 
 print("Creating project structure...")
 
@@ -11,7 +10,7 @@ dirs = [
 ]
 
 for d in dirs:
-    Path(d).mkdir(parents=True, exist_ok=True)
+    os.makedirs(d, exist_ok=True)
     print(f"Created directory: {d}")
 
 # Create files
@@ -29,10 +28,13 @@ files = {
     "frontend/index.html": "<html><body><h1>AI Image Generator</h1></body></html>"
 }
 
+# Every parent directory is in `dirs`, so files are written straight away
 for filepath, content in files.items():
-    path = Path(filepath)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(content)
+    fd = os.open(filepath, os.O_CREAT | os.O_TRUNC | os.O_WRONLY, 0o644)
+    try:
+        os.write(fd, content.encode())
+    finally:
+        os.close(fd)
     print(f"Created: {filepath}")
 
 print("\nSetup complete!")
\ No newline at end of file